@@ -0,0 +1,71 @@
+"""
+Benchmark the import time of the app modules with lazy and eager library imports.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time --repeat 5
+
+Each measurement imports the modules in a fresh interpreter with
+`python -X importtime`, once with LAZY_IMPORTS=1 and once with LAZY_IMPORTS=0,
+and reports the cumulative import time and the slowest packages.
+"""
+from library.libraries import os, sys, argparse, subprocess
+
+DEFAULT_MODULES = ['library.libraries', 'function.pipelines', 'components.analystics']
+
+
+def import_times(modules, lazy):
+    """
+    Import modules in a fresh interpreter and collect `-X importtime` results.
+
+    Parameters:
+    - modules (list): Module names imported in order.
+    - lazy (bool): Value of LAZY_IMPORTS in the child process.
+
+    Returns:
+    dict: {package: cumulative microseconds} for every package imported.
+    """
+    environment = dict(os.environ, LAZY_IMPORTS='1' if lazy else '0')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         '; '.join(f'import {module}' for module in modules)],
+        env=environment, capture_output=True, text=True, check=True)
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line[len('import time:'):].split('|')
+        timings[package.strip()] = int(cumulative)
+    return timings
+
+
+def main(argv=None):
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10,
+                        help="Number of slowest packages shown for the eager import.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for lazy in (True, False):
+        runs = [import_times(args.modules, lazy) for _ in range(args.repeat)]
+        total = min(sum(run[module] for module in args.modules if module in run) for run in runs)
+        results[lazy] = (total, runs[-1])
+
+    print(f"{'mode':>6} {'import time (ms)':>17} {'packages':>9}")
+    for lazy, (total, run) in results.items():
+        print(f"{'lazy' if lazy else 'eager':>6} {total / 1000:>17.1f} {len(run):>9}")
+    print(f"speedup: {results[False][0] / results[True][0]:.1f}x")
+
+    eager_run, lazy_run = results[False][1], results[True][1]
+    top_level = {package: micros for package, micros in eager_run.items() if '.' not in package}
+    print("\nSlowest top-level packages (eager), and whether the lazy import still loads them:")
+    for package, micros in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:>24} {micros / 1000:>9.1f} ms  {'loaded' if package in lazy_run else 'deferred'}")
+
+
+if __name__ == '__main__':
+    main()
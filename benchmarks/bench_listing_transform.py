@@ -0,0 +1,108 @@
+"""
+Benchmark the listing transform: record-to-columnar builder vs. pd.json_normalize.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_listing_transform --records 5000 --repeat 5
+
+Synthetic `mapResults` records mimic the shape of the scraper API response,
+including the nested keys that json_normalize flattens and we then discard.
+"""
+from library.libraries import argparse, random, time, pd
+from function.listing_transform import build_listing_frame, clean_listings
+
+PRICES = ['$1,234,000', '$515,000', '$89,900', 'From $300,000', '$2,450,000+']
+
+
+def make_records(count, seed=0):
+    """
+    Generate synthetic `mapResults` records.
+
+    Parameters:
+    - count (int): Number of records.
+    - seed (int, optional): Random seed.
+
+    Returns:
+    list: The records.
+    """
+    rng = random.Random(seed)
+    records = []
+    for index in range(count):
+        home_info = {
+            'zpid': 10000 + index, 'streetAddress': f'{index} Main St', 'zipcode': '90001',
+            'city': 'Los Angeles', 'state': 'CA', 'latitude': 34 + rng.random(),
+            'longitude': -118 - rng.random(), 'price': 100000.0 + index,
+            'bathrooms': float(rng.randint(1, 4)), 'bedrooms': float(rng.randint(1, 6)),
+            'livingArea': float(rng.randint(500, 4000)), 'homeType': 'SINGLE_FAMILY',
+            'homeStatus': 'FOR_SALE', 'homeStatusForHDP': 'FOR_SALE', 'priceForHDP': 100000.0,
+            'daysOnZillow': rng.randint(0, 200), 'isFeatured': False, 'shouldHighlight': False,
+            'currency': 'USD', 'country': 'USA', 'taxAssessedValue': 90000.0,
+            'lotAreaValue': 0.2, 'lotAreaUnit': 'acres', 'isUnmappable': False,
+            'isPreforeclosureAuction': False, 'isNonOwnerOccupied': True,
+            'isPremierBuilder': False, 'isZillowOwned': False, 'isShowcaseListing': False,
+            'zestimate': 400000.0 + index, 'rentZestimate': 3000.0 + index,
+            'homeDetailUrl': f'/homedetails/{index}_zpid/',
+            'listing_sub_type': {'is_FSBA': bool(index % 2)},
+            'unitCount': None, 'openHouseInfo': {'openHouseShowingList': [{'start': 1, 'end': 2}]},
+            'group_type': 'x', 'priceSuffix': '', 'tourViewCount': rng.randint(0, 50),
+        }
+        if index % 5 == 0:
+            home_info['priceChange'] = -5000
+            home_info['datePriceChanged'] = 1690000000000
+            home_info['priceReduction'] = '$5,000 (Jul 1)'
+        records.append({
+            'zpid': str(10000 + index), 'price': rng.choice(PRICES), 'imgSrc': 'https://x/y.jpg',
+            'detailUrl': f'/homedetails/{index}_zpid/', 'statusType': 'FOR_SALE',
+            'latLong': {'latitude': 34.0, 'longitude': -118.0},
+            'variableData': {'type': 'TIME_ON_INFO', 'text': '3 hours ago'},
+            'badgeInfo': None, 'hasImage': True, 'isFavorite': False, 'visited': False,
+            'carouselPhotos': [{'url': f'https://x/{n}.jpg'} for n in range(5)],
+            'hdpData': {'homeInfo': home_info},
+        })
+    return records
+
+
+def json_normalize_path(map_results):
+    """The previous implementation: flatten everything, then select columns."""
+    raw = pd.json_normalize(map_results)
+    raw.columns = [column.replace('hdpData.homeInfo.', '') for column in raw.columns]
+    raw = raw.loc[:, ~raw.columns.duplicated()]
+    return clean_listings(raw)
+
+
+def columnar_path(map_results):
+    """The current implementation: extract only the schema columns."""
+    return clean_listings(build_listing_frame(map_results))
+
+
+def best_of(function, records, repeat):
+    """Return the fastest of `repeat` runs in seconds and the last result."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(records)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--records', type=int, nargs='+', default=[500, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'records':>8} {'json_normalize (ms)':>20} {'columnar (ms)':>14} {'speedup':>8}")
+    for count in args.records:
+        records = make_records(count)
+        legacy_seconds, expected = best_of(json_normalize_path, records, args.repeat)
+        columnar_seconds, actual = best_of(columnar_path, records, args.repeat)
+        pd.testing.assert_frame_equal(
+            expected.reset_index(drop=True), actual.reset_index(drop=True), check_dtype=False)
+        print(f"{count:>8} {legacy_seconds * 1000:>20.1f} {columnar_seconds * 1000:>14.1f} "
+              f"{legacy_seconds / columnar_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
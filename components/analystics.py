@@ -6,15 +6,84 @@ It interfaces with Google Cloud Storage to fetch the data files and then uses th
 from the `analysis_tools` to display metrics, charts, summaries, and maps.
 """
 
-from library.libraries import st
+from library.libraries import os, st, px, datetime, timedelta
 
-from function.functions import gcs_connect, list_files_in_gcs, download_file_from_gcs
+from function.functions import gcs_connect, download_file_from_gcs
+from function.catalog import list_catalog
+from function.snapshots import materialize_snapshot
+from function.listing_analytics import GROUP_COLUMNS, TIME_BUCKETS, MAX_SNAPSHOTS, listing_trends
 from function.analysis_tools import (
+    listing_metrics, listing_chart_specs, map_table,
     show_listing_metrics, show_listing_charts,
     show_property_metrics, show_property_summary,
     show_property_charts, show_map_and_data
 )
 
+# Files kept parsed in memory per process, shared by all sessions.
+ANALYTICS_CACHE_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_ENTRIES', 16))
+# Seconds a trends result is reused before newly stored snapshots are read.
+TRENDS_CACHE_TTL = float(os.environ.get('TRENDS_CACHE_TTL', 600))
+# Days shown by default in Listing Trends.
+TRENDS_DEFAULT_DAYS = int(os.environ.get('TRENDS_DEFAULT_DAYS', 30))
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner="Loading file...")
+def load_frame(prefix, filename, version, location=None):
+    """
+    Download and parse a stored file once per file version.
+
+    The returned DataFrame is shared between reruns and sessions, so callers must
+    not modify it in place.
+
+    Parameters:
+    - prefix (str): 'listings' or 'properties'.
+    - filename (str): The name of the file.
+    - version (str): Changes whenever the file is stored again, e.g. its `createAt`.
+    - location (str, optional): The folder of the file, e.g. a listing partition.
+      Defaults to `prefix`.
+
+    Returns:
+    DataFrame or None: The data, or None if the file doesn't exist.
+    """
+    storage_client = gcs_connect()
+    if prefix == 'listings':
+        return materialize_snapshot(filename, storage_client, location or prefix)
+    return download_file_from_gcs(filename, storage_client, prefix)
+
+
+@st.cache_data(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def listing_view(filename, version, _data_frame):
+    """
+    Compute the metrics, chart specs and data table of a listing file once per version.
+
+    Parameters:
+    - filename (str): The name of the file.
+    - version (str): The version passed to `load_frame`.
+    - _data_frame (DataFrame): The data from `load_frame`. Not hashed.
+
+    Returns:
+    dict: 'metrics', 'charts' and 'table'.
+    """
+    return {'metrics': listing_metrics(_data_frame),
+            'charts': listing_chart_specs(_data_frame),
+            'table': map_table(_data_frame)}
+
+
+@st.cache_data(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def property_table(filename, version, _data_frame):
+    """
+    Compute the data table of a property file once per version.
+
+    Parameters:
+    - filename (str): The name of the file.
+    - version (str): The version passed to `load_frame`.
+    - _data_frame (DataFrame): The data from `load_frame`. Not hashed.
+
+    Returns:
+    tuple: The result of `map_table`.
+    """
+    return map_table(_data_frame)
+
 
 def data_analystic():
     """
@@ -38,37 +107,131 @@ def data_analystic():
 
     option = st.selectbox(
         'Search Type (select below 👇)',
-        ('Listings', 'Property Detail'))
+        ('Listings', 'Property Detail', 'Listing Trends'))
+
+    if option == 'Listing Trends':
+        show_listing_trends(gcs_connect())
+        return
 
     if option == 'Listings':
         prefix = 'listings'
     else:
         prefix = 'properties'
 
-    storage_client = gcs_connect()
-    files = list_files_in_gcs(storage_client, prefix)
+    documents = {document['file']: document for document in choose_catalog_files(prefix)}
 
-    if files:
-        files = ["Select a file"] + files
+    if documents:
+        files = ["Select a file"] + list(documents)
         selected_file = st.selectbox('Choose a file', files)
+        if selected_file == "Select a file":
+            st.success("Choose a file from the dropdown above to view data.")
+            return
         try:
-            data_frame = download_file_from_gcs(
-                selected_file, storage_client, prefix)
+            document = documents[selected_file]
+            version = str(document.get('createAt'))
+            data_frame = load_frame(prefix, selected_file, version, document.get('prefix'))
             if data_frame is None:
                 st.success(
                     "Choose a file from the dropdown above to view data.")
                 return
 
             if prefix == 'listings':
+                view = listing_view(selected_file, version, data_frame)
                 st.title("Charts 📈")
-                show_listing_metrics(data_frame)
-                show_listing_charts(data_frame)
-                show_map_and_data(data_frame, selected_file)
+                show_listing_metrics(data_frame, view['metrics'])
+                show_listing_charts(data_frame, view['charts'])
+                show_map_and_data(data_frame, selected_file, view['table'])
             else:
                 show_property_metrics(data_frame)
                 show_property_summary(data_frame)
                 show_property_charts(data_frame)
-                show_map_and_data(data_frame, selected_file)
+                show_map_and_data(data_frame, selected_file,
+                                  property_table(selected_file, version, data_frame))
 
         except (IOError, ValueError) as error_message:
             st.error(f"An error occurred: {str(error_message)}")
+
+
+def choose_catalog_files(prefix):
+    """
+    Display the catalog filters and return one page of matching files.
+
+    Parameters:
+    - prefix (str): 'listings' or 'properties'.
+
+    Returns:
+    list: The metadata documents, newest first.
+    """
+    filters = {}
+    col1, col2, col3 = st.columns(3)
+    if prefix == 'listings':
+        with col1:
+            filters['state'] = st.text_input('State ID').strip().upper() or None
+        with col2:
+            filters['city'] = st.text_input('City').strip() or None
+    else:
+        with col1:
+            filters['zpid'] = st.text_input('ZPID').strip() or None
+    with col3:
+        filters['search'] = st.text_input('File name contains').strip() or None
+
+    page = st.number_input('Page', min_value=1, value=1, step=1) - 1
+    documents, has_more = list_catalog(prefix, page=page, **filters)
+    if has_more:
+        st.caption("More files on the next page.")
+    return documents
+
+
+@st.cache_data(ttl=TRENDS_CACHE_TTL, max_entries=ANALYTICS_CACHE_ENTRIES,
+               show_spinner="Loading snapshots...")
+def cached_listing_trends(_storage_client, state, city, start, end, group_by, time_bucket):
+    """
+    Compute listing trends once per set of filters.
+
+    Parameters:
+    - _storage_client (storage.Client): The Google Cloud Storage client. Not hashed.
+    - state, city, start, end, group_by, time_bucket: Passed to `listing_trends`.
+
+    Returns:
+    DataFrame or None: The result of `listing_trends`.
+    """
+    return listing_trends(_storage_client, state=state, city=city, start=start, end=end,
+                          group_by=group_by, time_bucket=time_bucket)
+
+
+def show_listing_trends(storage_client):
+    """
+    Display grouped listing statistics across the stored snapshots of a period.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+
+    Returns:
+    - None
+    """
+    today = datetime.today().date()
+    col1, col2 = st.columns(2)
+    with col1:
+        state = st.text_input('State ID (e.g. CA)').strip().upper() or None
+        start = st.date_input('From', today - timedelta(days=TRENDS_DEFAULT_DAYS))
+        group_by = st.multiselect('Group by', GROUP_COLUMNS, default=['city'])
+    with col2:
+        city = st.text_input('City').strip().title() or None
+        end = st.date_input('To', today)
+        time_bucket = st.selectbox('Period', TIME_BUCKETS)
+    st.caption(f"At most the {MAX_SNAPSHOTS} newest snapshots in the period are read.")
+
+    if not st.button('Run', key='trends'):
+        return
+
+    trends = cached_listing_trends(storage_client, state, city, start, end,
+                                   tuple(group_by), time_bucket)
+    if trends is None or trends.empty:
+        st.warning("No stored listings match these filters.")
+        return
+
+    st.dataframe(trends)
+    series = trends[group_by].astype(str).agg(' / '.join, axis=1) if group_by else None
+    fig = px.line(trends, x='period', y='median_price', color=series, markers=True,
+                  title='Median Price')
+    st.plotly_chart(fig)
@@ -4,13 +4,11 @@ Module for retrieving and processing property listing information.
 This module fetches property listing details from a given URL,
 processes the data, and uploads it to Google Cloud Storage.
 """
-from library.libraries import st, pd, np
+from library.libraries import st
 from function.functions import (
-    get_listings, listings_save_to_db,
-    gcs_connect, file_upload_to_gcs,
-    get_states_from_usa, get_cities_from_state,
-    generate_zillow_url, download_location_file_from_gcs
+    gcs_connect, generate_zillow_url, get_location_index, LOCATION_FILE
 )
+from function.pipelines import search_and_store_listings
 
 
 def get_listing_info():
@@ -37,26 +35,21 @@ def get_listing_info():
     zillow_url = None
 
     if selected_country_name == "United States":
-        file_name = "merged_usacities_data.csv"
-        data_frame = download_location_file_from_gcs(file_name, storage_client)
-        if data_frame is not None:
-            states = ["Select a state"] + get_states_from_usa(data_frame)
+        location_index = get_location_index(storage_client, LOCATION_FILE)
+        if location_index is not None:
+            states = ["Select a state"] + location_index["states"]
             selected_state = st.selectbox("Select a state", states)
             # st.write(selected_state)
 
             if selected_state != "Select a state":
                 cities = ["Select a city"] + \
-                    get_cities_from_state(data_frame, selected_state)
+                    location_index["cities"].get(selected_state, [])
                 selected_city = st.selectbox("Select a city", cities)
                 # st.write(selected_city)
 
                 if selected_city != "Select a city":
-                    city_data = data_frame[data_frame["City"]
-                                           == selected_city].iloc[0]
-                    city_lat = city_data['Latitude']
-                    city_lng = city_data['Longitude']
-                    state_id = city_data['StateID']
-                    region_id = city_data['RegionID']
+                    city_lat, city_lng, state_id, region_id = \
+                        location_index["locations"][(selected_state, selected_city)]
 
                     zillow_url = generate_zillow_url(
                         selected_city, state_id, city_lat, city_lng, region_id)
@@ -64,128 +57,18 @@ def get_listing_info():
 
     # If Run button is pressed
     if st.button("Run", type="secondary"):
-        # Get listings data from external source/API
-        result = get_listings(listing_url=zillow_url)
-        # st.write(result.json())
+        if zillow_url is None:
+            st.warning("Select a country, state and city before running the search.")
+            return
+
+        # Fetch, clean and store the listings. Identical concurrent searches share one run.
+        stored = search_and_store_listings(zillow_url, storage_client)
 
         # If API request is successful
-        if result.json()['is_success']:
-            num_of_properties = result.json(
-            )['data']['categoryTotals']['cat1']['totalResultCount']
-            # st.write(num_of_properties)
-
-            df_sale_listings = pd.json_normalize(
-                result.json()['data']['cat1']['searchResults']['mapResults'])
-            df_sale_listings.columns = [col.replace(
-                'hdpData.homeInfo.', '') for col in df_sale_listings.columns]
-
-            required_columns = [
-                "zpid", "imgSrc", "detailUrl", "streetAddress", "zipcode", "city",
-                "state", "latitude", "longitude", "price", "bathrooms", "bedrooms",
-                "homeType", "homeStatus", "daysOnZillow", "isFeatured", "shouldHighlight",
-                "is_FSBA", "isUnmappable", "isPreforeclosureAuction", "homeStatusForHDP",
-                "priceForHDP", "isNonOwnerOccupied", "isPremierBuilder", "isZillowOwned",
-                "currency", "country", "lotAreaValue", "lotAreaUnit", "isShowcaseListing",
-                "taxAssessedValue", "rentZestimate", "zestimate", "datePriceChanged",
-                "livingArea", "priceReduction", "priceChange", "streetName", "homeDetailUrl",
-                "price_to_rent_ratio"
-            ]
-
-            existing_columns = [
-                col for col in required_columns if col in df_sale_listings.columns]
-            df_merged = df_sale_listings[existing_columns]
-            df_filtered = df_merged.loc[:, ~df_merged.columns.duplicated()]
-            df_filtered = df_filtered.copy()
-            df_filtered.loc[:, 'streetName'] = df_filtered['streetAddress']
-            if 'homeDetailUrl' in df_filtered.columns:
-                df_filtered.loc[:, 'homeDetailUrl'] = "https://www.zillow.com" + \
-                    df_filtered['homeDetailUrl']
-            else:
-                print("'homeDetailUrl' column not found in df_filtered.")
-
-            if 'listing_sub_type.is_FSBA' in df_sale_listings.columns:
-                df_filtered['is_FSBA'] = df_sale_listings['listing_sub_type.is_FSBA']
-            else:
-                df_filtered['is_FSBA'] = np.nan
-
-            df_filtered = df_filtered[~df_filtered['price'].str.contains(
-                'From', na=False)]
-            df_filtered['price'] = df_filtered['price'].str.replace(
-                r'\$|,', '', regex=True)
-
-            df_filtered['original_price'] = df_filtered['price']
-
-            try:
-                df_filtered['price'] = df_filtered['price'].str.replace(
-                    '[^0-9]', '', regex=True).astype(int)
-
-            except ValueError as error_message:
-                raise error_message
-
-            assert df_filtered['price'].dtype == 'int64'
-
-            mask1_price = df_filtered['price'].notnull()
-            mask1_rent = (
-                df_filtered['rentZestimate'].notnull()
-            ) if 'rentZestimate' in df_filtered.columns else pd.Series([False] * len(df_filtered))
-
-            if mask1_rent.any():
-                mask1 = mask1_price & mask1_rent
-                df_filtered.loc[mask1, 'price_to_rent_ratio'] = (
-                    df_filtered.loc[mask1, 'price'] /
-                    df_filtered.loc[mask1, 'rentZestimate']
-                )
-
-            else:
-                # 'rentZestimate' 열이 없을 때의 처리. 필요하다면 경고 메시지를 출력하거나 다른 처리를 할 수 있습니다.
-                print("'rentZestimate' column not found in df_filtered.")
-
-            mask2_price = df_filtered['price'].notnull()
-            mask2_price_change = False
-            if 'priceChange' in df_filtered.columns:
-                mask2_price_change = df_filtered['priceChange'].notnull()
-
-            mask2_rent = (
-                df_filtered['rentZestimate'].notnull()
-            ) if 'rentZestimate' in df_filtered.columns else pd.Series([False] * len(df_filtered))
-
-            if mask2_rent.any():
-                mask2 = mask2_price & mask2_price_change & mask2_rent
-                df_filtered.loc[mask2, 'price_to_rent_ratio'] = (
-                    df_filtered.loc[mask2, 'price'] +
-                    df_filtered.loc[mask2, 'priceChange']
-                ) / df_filtered.loc[mask2, 'rentZestimate']
-
-            else:
-                # 'rentZestimate' 열이 없을 때의 처리. 필요하다면 경고 메시지를 출력하거나 다른 처리를 할 수 있습니다.
-                print("'rentZestimate' column not found in df_filtered.")
-
-            if 'price_to_rent_ratio' in df_filtered.columns:
-                df_filtered['price_to_rent_ratio'].fillna(np.nan, inplace=True)
-            else:
-                df_filtered['price_to_rent_ratio'] = np.nan
-
-            df_filtered['zipcode'] = df_filtered['zipcode'].astype(str)
-            df_filtered['zpid'] = df_filtered['zpid'].astype(str)
-
-            existing_required_columns = [
-                col for col in required_columns if col in df_filtered.columns]
-            df_filtered = df_filtered[existing_required_columns]
-
-            # Prepare data for database saving and get a unique identifier
-            data_for_mongo = {
-                "description": "Listing data for ObjectId generation"}
-            object_id, filename = listings_save_to_db(data_for_mongo)
-
-            # Connect to Google Cloud Storage (GCS)
-            storage_client = gcs_connect()
-
-            # Save the processed data to GCS
-            df_filtered.to_csv(filename, index=False)
-            file_upload_to_gcs(filename, storage_client, prefix='listings')
+        if stored is not None:
+            object_id, _, num_of_properties, num_of_listings = stored
 
             # Display a success message with the results
-            # st.write(e)
             st.markdown(
                 f"""
                 Successfully retrieved data! Go to the analytics tab to view results.
@@ -193,5 +76,10 @@ def get_listing_info():
                 Search ID: {object_id}
 
                 Number of properties matching search: {num_of_properties}
+
+                Number of listings stored: {num_of_listings}
             """
             )
+            if num_of_listings < num_of_properties:
+                st.warning(f"Only {num_of_listings} of {num_of_properties} listings could be "
+                           "retrieved. Raise LISTING_SPLIT_DEPTH to split large areas further.")
@@ -2,10 +2,9 @@
 This module provides functions and user interface elements to retrieve property details
 from either a unique identifier or a full address, and then process, store, and display the data.
 """
-from library.libraries import st, pd
-from function.functions import (
-    get_properties, preprocess_dataframe, properties_save_to_db, file_upload_to_gcs, gcs_connect
-)
+from library.libraries import st
+from function.functions import gcs_connect
+from function.pipelines import search_and_store_property
 
 
 def get_property_info():
@@ -53,33 +52,15 @@ def get_property_info():
     # Check if user has clicked the "Run" button
     if st.button("Run", type="secondary"):
 
-        # Call function to get properties using provided inputs
-        result = get_properties(zpid=zpid, address=address)
+        # Connect to Google Cloud Storage
+        storage_client = gcs_connect()
 
-        # Check if the API call was successful
-        if result.json()['is_success']:
-
-            # Parse the JSON response to a DataFrame
-            data = result.json()['data']
-            df_prop = pd.json_normalize(data)
-            for col in df_prop.columns:
-                df_prop[col] = df_prop[col].apply(lambda x: str(
-                    x) if isinstance(x, list) or isinstance(x, dict) else x)
-
-            # Preprocess the obtained DataFrame
-            df_prop = preprocess_dataframe(df_prop)
+        # Fetch, preprocess and store the property. Identical concurrent
+        # lookups share one run.
+        stored = search_and_store_property(zpid, address, storage_client)
 
-            # Save the data to the database and get relevant info
-            data_for_mongo = {
-                "description": "Property data for ObjectId generation"}
-            _, filename = properties_save_to_db(data_for_mongo, zpid)
-
-            # Connect to Google Cloud Storage
-            storage_client = gcs_connect()
-
-            # Upload the DataFrame as CSV to GCS
-            df_prop.to_csv(filename, index=False)
-            file_upload_to_gcs(filename, storage_client, prefix='properties')
+        # Check if the API call was successful
+        if stored is not None:
 
             # Show success message to user
             st.markdown(
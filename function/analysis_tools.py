@@ -4,46 +4,60 @@ charts, summaries, and associated data using Streamlit. The module makes use
 of external libraries for data manipulation and visualization, and utility
 functions for data cleaning and processing.
 """
-from library.libraries import st, px, pd, json
-from function.functions import clean_price, fix_json_string, safe_int_conversion
+from library.libraries import os, io, st, px, pd
+from function.functions import clean_price, decode_nested, safe_int_conversion
+from function.serialization import write_frame
 
 #####################################
 #              METRICS              #
 #####################################
 
 
-def show_listing_metrics(data_frame):
+def listing_metrics(data_frame):
     """
-    Display metrics related to property listings.
+    Compute the metrics of property listings.
 
     Parameters:
     - data_frame (DataFrame): The data containing property listings.
 
     Returns:
-    None
+    list: (label, formatted value) tuples.
     """
     data_frame = data_frame.copy()
-    st.markdown("## Property Metrics 🏙️")
-    col1, col2, col3, col4 = st.columns(4)
-
     data_frame['price'] = data_frame['price'].astype(str).apply(clean_price)
     data_frame = data_frame.dropna(subset=['price'])
 
-    col1.metric('Total', len(data_frame))
-    col2.metric('Avg Sale Price',
-                f"${int(data_frame['price'].mean()):,}".split(',')[0] + 'K')
+    metrics = [('Total', len(data_frame)),
+               ('Avg Sale Price', f"${int(data_frame['price'].mean()):,}".split(',')[0] + 'K')]
 
     if 'zestimate' in data_frame.columns:
-        col3.metric('Avg Est Value',
-                    f"${int(data_frame['zestimate'].mean()):,}".split(',')[0] + 'K')
+        metrics.append(('Avg Est Value',
+                        f"${int(data_frame['zestimate'].mean()):,}".split(',')[0] + 'K'))
     else:
-        col3.metric('Avg Est Value', 'N/A')
+        metrics.append(('Avg Est Value', 'N/A'))
 
     if 'rentZestimate' in data_frame.columns:
-        col4.metric('Avg Est Rent',
-                    f"${int(data_frame['rentZestimate'].mean()):,}".split(',')[0] + 'K')
+        metrics.append(('Avg Est Rent',
+                        f"${int(data_frame['rentZestimate'].mean()):,}".split(',')[0] + 'K'))
     else:
-        col4.metric('Avg Est Rent', 'N/A')
+        metrics.append(('Avg Est Rent', 'N/A'))
+    return metrics
+
+
+def show_listing_metrics(data_frame, metrics=None):
+    """
+    Display metrics related to property listings.
+
+    Parameters:
+    - data_frame (DataFrame): The data containing property listings.
+    - metrics (list, optional): Precomputed result of `listing_metrics`.
+
+    Returns:
+    None
+    """
+    st.markdown("## Property Metrics 🏙️")
+    for column, (label, value) in zip(st.columns(4), metrics or listing_metrics(data_frame)):
+        column.metric(label, value)
 
 
 def show_property_metrics(data_frame):
@@ -130,49 +144,51 @@ def show_property_summary(data_frame):
 #             CHARTS                #
 #####################################
 
-def show_listing_charts(data_frame):
+# (column, plotly.express function, title). Functions are looked up by name when a
+# chart is built, so importing this module does not import plotly.
+LISTING_CHARTS = [
+    ('price', 'box', "Sales Price Box Chart"),
+    ('zestimate', 'histogram', "Estimate Value Histogram Chart"),
+    ('rentZestimate', 'histogram', "Rent Estimate Value Histogram Chart"),
+    ('price_to_rent_ratio', 'box', "Price to Rent Ratio Box Chart"),
+]
+
+
+def listing_chart_specs(data_frame):
     """
-    Display charts related to property listings.
+    Build the charts of property listings as plotly figure dicts.
 
     Parameters:
     - data_frame (DataFrame): The data containing property listings.
 
     Returns:
-    None
+    list: (column, title, figure dict or None if the column is missing) tuples.
     """
-    data_frame = data_frame.copy()
-    with st.expander('Charts', expanded=True):
+    return [
+        (column, title,
+         getattr(px, chart)(data_frame, x=column, title=title).to_dict()
+         if column in data_frame.columns else None)
+        for column, chart, title in LISTING_CHARTS
+    ]
 
-        if 'price' in data_frame.columns:
-            fig = px.box(data_frame, x="price", title="Sales Price Box Chart")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("Column 'price' missing. Cannot display "
-                       "Sales Price Box Chart.")
 
-        if 'zestimate' in data_frame.columns:
-            fig = px.histogram(data_frame, x="zestimate",
-                               title="Estimate Value Histogram Chart")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("Column 'zestimate' missing. Cannot display "
-                       "Estimate Value Histogram Chart.")
+def show_listing_charts(data_frame, specs=None):
+    """
+    Display charts related to property listings.
 
-        if 'rentZestimate' in data_frame.columns:
-            fig = px.histogram(data_frame, x="rentZestimate",
-                               title="Rent Estimate Value Histogram Chart")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("Column 'rentZestimate' missing. Cannot display "
-                       "Rent Estimate Value Histogram Chart.")
+    Parameters:
+    - data_frame (DataFrame): The data containing property listings.
+    - specs (list, optional): Precomputed result of `listing_chart_specs`.
 
-        if 'price_to_rent_ratio' in data_frame.columns:
-            fig = px.box(data_frame, x="price_to_rent_ratio",
-                         title="Price to Rent Ratio Box Chart")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("Column 'price_to_rent_ratio' missing. Cannot display "
-                       "Price to Rent Ratio Box Chart.")
+    Returns:
+    None
+    """
+    with st.expander('Charts', expanded=True):
+        for column, title, figure in specs or listing_chart_specs(data_frame):
+            if figure is not None:
+                st.plotly_chart(figure, use_container_width=True)
+            else:
+                st.warning(f"Column '{column}' missing. Cannot display {title}.")
 
 
 def show_property_charts(data_frame):
@@ -187,11 +203,7 @@ def show_property_charts(data_frame):
     """
     data_frame = data_frame.copy()
     with st.expander('Charts', expanded=True):
-        data_frame['taxHistory'] = data_frame['taxHistory'].apply(
-            fix_json_string)
-        data_frame['taxHistory'] = data_frame['taxHistory'].apply(json.loads)
-
-        tax_hist_list = data_frame['taxHistory'].iloc[0]
+        tax_hist_list = decode_nested(data_frame['taxHistory'].iloc[0])
         if tax_hist_list:  # 값이 있으면 실행
             tax_hist_data_frame = pd.DataFrame(tax_hist_list)
             if 'time' in tax_hist_data_frame.columns:  # 'time' 열이 있는지 확인
@@ -205,12 +217,7 @@ def show_property_charts(data_frame):
         else:
             st.warning("'taxHistory' is empty. No data to display.")
 
-        data_frame['priceHistory'] = data_frame['priceHistory'].apply(
-            fix_json_string)
-        data_frame['priceHistory'] = data_frame['priceHistory'].apply(
-            json.loads)
-
-        price_hist_list = data_frame['priceHistory'].iloc[0]
+        price_hist_list = decode_nested(data_frame['priceHistory'].iloc[0])
         if price_hist_list:  # 값이 있으면 실행
             price_hist_data_frame = pd.DataFrame(price_hist_list)
             if 'date' in price_hist_data_frame.columns:  # 'date' 열이 있는지 확인
@@ -229,19 +236,39 @@ def show_property_charts(data_frame):
 #               DATA                #
 #####################################
 
-def show_map_and_data(data_frame, selected_file):
+def map_table(data_frame):
+    """
+    Prepare the data table and its CSV download of a dataset.
+
+    Parameters:
+    - data_frame (DataFrame): The dataset containing properties.
+
+    Returns:
+    tuple: (DataFrame with zipcode and zpid as text, CSV bytes).
+    """
+    data_frame = data_frame.copy()
+    data_frame['zipcode'] = data_frame['zipcode'].apply(
+        safe_int_conversion).apply(lambda x: f"{x}")
+    data_frame['zpid'] = data_frame['zpid'].apply(
+        safe_int_conversion).apply(lambda x: f"{x}")
+
+    buffer = io.BytesIO()
+    write_frame(data_frame, buffer, 'csv')
+    return data_frame, buffer.getvalue()
+
+
+def show_map_and_data(data_frame, selected_file, table=None):
     """
     Display map and data table of the given dataset.
 
     Parameters:
     - data_frame (DataFrame): The dataset containing properties.
     - selected_file (str): Name of the selected file for downloading.
+    - table (tuple, optional): Precomputed result of `map_table`.
 
     Returns:
     None
     """
-    data_frame = data_frame.copy()
-
     with st.expander('Data', expanded=True):
         # Map
         st.subheader("Map")
@@ -249,21 +276,12 @@ def show_map_and_data(data_frame, selected_file):
 
         # Dataset
         st.subheader("Dataset")
+        table_frame, csv = table or map_table(data_frame)
+        st.write(table_frame)
 
-        # st.write(data_frame.dtypes)
-        data_frame['zipcode'] = data_frame['zipcode'].apply(
-            safe_int_conversion).apply(lambda x: f"{x}")
-        data_frame['zpid'] = data_frame['zpid'].apply(
-            safe_int_conversion).apply(lambda x: f"{x}")
-
-        st.write(data_frame)
-
-        csv = data_frame.to_csv(index=False)
         st.download_button(
             label="Download 🔽",
             data=csv,
-            file_name=(
-                f"{selected_file if not selected_file.endswith('.csv') else selected_file[:-4]}.csv"
-            ),
+            file_name=f"{os.path.splitext(selected_file)[0]}.csv",
             mime="text/csv"
         )
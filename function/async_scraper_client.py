@@ -0,0 +1,229 @@
+"""
+This module provides an asyncio client for the Zillow Scraper API.
+
+It is meant for batch jobs that fetch many cities or properties at once: the
+number of requests in flight is bounded by a semaphore and the request rate by
+a token bucket matching the API quota. Results are yielded as they complete.
+"""
+from library.libraries import asyncio, os, time, random, httpx
+from function.scraper_client import (
+    DEFAULT_BASE_URL, DEFAULT_TIMEOUTS, HEADERS, RETRY_STATUSES, ScraperResult, parse_response
+)
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get('SCRAPER_MAX_CONCURRENCY', 10))
+DEFAULT_RATE_LIMIT = float(os.environ.get('SCRAPER_RATE_LIMIT', 5))
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for asyncio tasks.
+
+    Parameters:
+    - rate (float): Tokens added per second, i.e. the sustained request rate.
+    - capacity (float, optional): Maximum burst size. Defaults to `rate` (at least 1).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncScraperClient:
+    """
+    Async client for the Zillow Scraper API. Use it as an async context manager.
+
+    Parameters:
+    - api_key (str, optional): The API key. Defaults to the API_KEY variable.
+    - base_url (str, optional): The API base URL. Defaults to the SCRAPER_BASE_URL variable
+      or the public endpoint.
+    - timeouts (dict, optional): (connect, read) timeouts per endpoint.
+    - max_concurrency (int, optional): Maximum requests in flight.
+      Defaults to the SCRAPER_MAX_CONCURRENCY variable or 10.
+    - rate_limit (float, optional): Maximum requests per second.
+      Defaults to the SCRAPER_RATE_LIMIT variable or 5.
+    - burst (float, optional): Token bucket capacity. Defaults to `rate_limit`.
+    - max_retries (int, optional): Retries for transport errors and 429/5xx responses.
+    - backoff_factor (float, optional): Base of the exponential backoff between retries.
+    """
+
+    def __init__(self, api_key=None, base_url=None, timeouts=None,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, rate_limit=DEFAULT_RATE_LIMIT,
+                 burst=None, max_retries=3, backoff_factor=0.5):
+        self.api_key = api_key or os.environ.get('API_KEY')
+        self.base_url = (base_url or os.environ.get('SCRAPER_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = TokenBucket(rate_limit, burst)
+        self._client = None
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            headers=HEADERS,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._client.aclose()
+        self._client = None
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2 ** attempt) * (1 + random.random() / 10)
+
+    async def request(self, endpoint, params):
+        """
+        Call an API endpoint.
+
+        Parameters:
+        - endpoint (str): The endpoint name, e.g. 'listing' or 'property'.
+        - params (dict): Query parameters. None values are dropped.
+
+        Returns:
+        ScraperResult: The parsed result.
+        """
+        querystring = {"api_key": self.api_key}
+        querystring.update({key: value for key, value in params.items() if value is not None})
+        connect_timeout, read_timeout = self.timeouts.get(endpoint, (5, 30))
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+        attempt = 0
+        while True:
+            response = None
+            async with self._semaphore:
+                await self._rate_limiter.acquire()
+                try:
+                    response = await self._client.get(
+                        f"{self.base_url}/{endpoint}", params=querystring, timeout=timeout)
+                except httpx.TransportError as error_message:
+                    if attempt >= self.max_retries:
+                        return ScraperResult(is_success=False, message=str(error_message))
+
+            if response is not None and (response.status_code not in RETRY_STATUSES
+                                         or attempt >= self.max_retries):
+                return parse_response(response)
+
+            # Sleep outside the semaphore so waiting retries don't block other requests.
+            await asyncio.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    async def get_listings(self, listing_url):
+        """
+        Retrieve listing data for a Zillow search URL.
+
+        Parameters:
+        - listing_url (str): The URL of the property listing.
+
+        Returns:
+        ScraperResult: The parsed result.
+        """
+        return await self.request("listing", {"url": listing_url})
+
+    async def get_properties(self, zpid=None, address=None):
+        """
+        Retrieve property data by ZPID or address.
+
+        Parameters:
+        - zpid (str, optional): The ZPID of the property.
+        - address (str, optional): The address of the property.
+
+        Returns:
+        ScraperResult: The parsed result.
+        """
+        return await self.request("property", {"zpid": zpid or None, "address": address or None})
+
+    async def _as_completed(self, keys, fetch):
+        async def keyed(key):
+            return key, await fetch(key)
+
+        tasks = [asyncio.ensure_future(keyed(key)) for key in keys]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fetch_listings_many(self, listing_urls):
+        """
+        Fetch many listing URLs concurrently.
+
+        Parameters:
+        - listing_urls (iterable): The URLs to fetch.
+
+        Yields:
+        tuple: (listing_url, ScraperResult) in completion order.
+        """
+        async for item in self._as_completed(listing_urls, self.get_listings):
+            yield item
+
+    async def fetch_properties_many(self, zpids):
+        """
+        Fetch many properties concurrently.
+
+        Parameters:
+        - zpids (iterable): The ZPIDs to fetch.
+
+        Yields:
+        tuple: (zpid, ScraperResult) in completion order.
+        """
+        async for item in self._as_completed(zpids, lambda zpid: self.get_properties(zpid=zpid)):
+            yield item
+
+
+def fetch_listings_batch(listing_urls, **client_options):
+    """
+    Fetch many listing URLs concurrently from synchronous code.
+
+    Parameters:
+    - listing_urls (iterable): The URLs to fetch.
+    - client_options (dict): Keyword arguments for `AsyncScraperClient`.
+
+    Returns:
+    dict: listing_url -> ScraperResult.
+    """
+    async def run():
+        async with AsyncScraperClient(**client_options) as client:
+            return {url: result async for url, result in client.fetch_listings_many(listing_urls)}
+
+    return asyncio.run(run())
+
+
+def fetch_properties_batch(zpids, **client_options):
+    """
+    Fetch many properties concurrently from synchronous code.
+
+    Parameters:
+    - zpids (iterable): The ZPIDs to fetch.
+    - client_options (dict): Keyword arguments for `AsyncScraperClient`.
+
+    Returns:
+    dict: zpid -> ScraperResult.
+    """
+    async def run():
+        async with AsyncScraperClient(**client_options) as client:
+            return {zpid: result async for zpid, result in client.fetch_properties_many(zpids)}
+
+    return asyncio.run(run())
@@ -0,0 +1,232 @@
+"""
+This module provides a buffered writer for listing and property metadata.
+
+Batch jobs that run many searches add their metadata here instead of calling
+`listings_save_to_db`/`properties_save_to_db` once per search. Documents are
+flushed with a single unordered `bulk_write` per collection when the buffer
+reaches a size or age threshold, and when the writer is closed.
+"""
+from library.libraries import (
+    os, threading, pymongo
+)
+from function.functions import build_listing_metadata, build_property_metadata
+from function.mongo_manager import get_mongo_manager
+from function.serialization import DEFAULT_FILE_FORMAT
+
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_MAX_INTERVAL = 5.0
+DUPLICATE_KEY_ERROR = 11000
+
+
+class MetadataBulkWriter:
+    """
+    Collect metadata documents and write them to MongoDB in batches.
+
+    Listing object IDs and file names are generated when a document is added,
+    so callers can upload files before the batch is flushed. Documents that
+    fail to write stay buffered and are retried by the next flush.
+
+    Parameters:
+    - max_batch_size (int, optional): Flush once this many documents are buffered.
+    - max_interval (float, optional): Flush this many seconds after the first document
+      of a batch was added, from a background timer.
+    - manager (MongoConnectionManager, optional): Defaults to the shared manager.
+    - on_flush (callable, optional): Called with the (object_id, filename) tuples of
+      every successful write, including automatic ones.
+    """
+
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_interval=DEFAULT_MAX_INTERVAL, manager=None, on_flush=None):
+        self.max_batch_size = max_batch_size
+        self.max_interval = max_interval
+        self._manager = manager
+        self._on_flush = on_flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._listings = []
+        self._properties = {}
+        self._written = []
+        self._timer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def manager(self):
+        """The connection manager used for flushing."""
+        return self._manager or get_mongo_manager()
+
+    def add_listing(self, data, file_format=DEFAULT_FILE_FORMAT, kind='full'):
+        """
+        Buffer a listing metadata document.
+
+        Parameters:
+        - data (dict): The data containing listing metadata.
+        - file_format (str, optional): The storage format of the file, 'csv' or 'parquet'.
+        - kind (str, optional): 'full' for a complete snapshot, 'delta' for changes only.
+
+        Returns:
+        tuple: A tuple containing the object ID and filename.
+        """
+        object_id, filename = build_listing_metadata(data, file_format, kind)
+        data['_id'] = object_id
+        self._add(lambda: self._listings.append(data))
+        return object_id, filename
+
+    def add_property(self, data, zpid, file_format=DEFAULT_FILE_FORMAT):
+        """
+        Buffer a property metadata document.
+
+        A property added twice before a flush keeps only the latest document.
+        A property already saved today keeps its stored ID, so the ID is only
+        known after the write: `flush()` returns it with the filename.
+
+        Parameters:
+        - data (dict): The data containing property metadata.
+        - zpid (str): The ZPID of the property.
+        - file_format (str, optional): The storage format of the file, 'csv' or 'parquet'.
+
+        Returns:
+        str: The filename.
+        """
+        object_id, filename = build_property_metadata(data, zpid, file_format)
+        self._add(lambda: self._properties.__setitem__(filename, (object_id, data)))
+        return filename
+
+    def _add(self, append):
+        with self._lock:
+            append()
+            pending = len(self._listings) + len(self._properties)
+            if pending < self.max_batch_size:
+                self._start_timer()
+        if pending >= self.max_batch_size:
+            self._flush_in_background()
+
+    def _start_timer(self):
+        """Schedule a flush of the current batch. Called with the lock held."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_interval, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        """Flush automatically. On failure the documents are retried after `max_interval`."""
+        try:
+            self._flush_buffer()
+        except pymongo.errors.PyMongoError as error_message:
+            print(f"Metadata flush failed, retrying in {self.max_interval}s: {error_message}")
+            with self._lock:
+                self._start_timer()
+
+    def _flush_buffer(self):
+        """Write the buffer. Documents that fail stay buffered and an error is raised."""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                listings, self._listings = self._listings, []
+                properties, self._properties = self._properties, {}
+
+            written = []
+            try:
+                inserted, listings = self._write_listings(listings)
+                written += inserted
+                written += self._write_properties(properties)
+                properties = {}
+            finally:
+                with self._lock:
+                    self._listings = listings + self._listings
+                    self._properties = {**properties, **self._properties}
+                    self._written += written
+                if written and self._on_flush:
+                    self._on_flush(written)
+
+            if listings:
+                raise pymongo.errors.PyMongoError(
+                    f"{len(listings)} listing metadata documents could not be written "
+                    "and stay buffered.")
+
+    def flush(self):
+        """
+        Write all buffered documents.
+
+        Returns:
+        list: (object_id, filename) tuples of every document written since the last
+        call, including automatic flushes, listings of each batch first.
+
+        Raises:
+        PyMongoError: If documents could not be written. They stay buffered.
+        """
+        self._flush_buffer()
+        with self._lock:
+            written, self._written = self._written, []
+        return written
+
+    def close(self):
+        """
+        Flush the remaining documents. The timer is stopped by the flush.
+
+        Returns:
+        list: The result of `flush()`.
+        """
+        return self.flush()
+
+    def _write_listings(self, listings):
+        """
+        Insert listings.
+
+        Returns:
+        tuple: ((object_id, filename) tuples written, documents that failed).
+        """
+        if not listings:
+            return [], []
+
+        manager = self.manager
+        collection_name = os.environ.get('LISTING_COLLECTION')
+        manager.ensure_index(collection_name, 'file', unique=True)
+        failed = set()
+        try:
+            with manager.track('listings.bulk_write'):
+                manager.get_collection(collection_name).bulk_write(
+                    [pymongo.InsertOne(data) for data in listings], ordered=False)
+        except pymongo.errors.BulkWriteError as error:
+            # A duplicate key means the document was stored by an earlier attempt.
+            failed = {item['index'] for item in error.details.get('writeErrors', [])
+                      if item.get('code') != DUPLICATE_KEY_ERROR}
+
+        written = [(data['_id'], data['file'])
+                   for index, data in enumerate(listings) if index not in failed]
+        return written, [listings[index] for index in sorted(failed)]
+
+    def _write_properties(self, properties):
+        if not properties:
+            return []
+
+        manager = self.manager
+        collection_name = os.environ.get('PROPERTY_COLLECTION')
+        collection = manager.get_collection(collection_name)
+        manager.ensure_index(collection_name, 'file', unique=True)
+
+        filenames = list(properties)
+        operations = [
+            pymongo.UpdateOne({'file': filename},
+                              {'$set': properties[filename][1],
+                               '$setOnInsert': {'_id': properties[filename][0]}},
+                              upsert=True)
+            for filename in filenames
+        ]
+        with manager.track('properties.bulk_write'):
+            collection.bulk_write(operations, ordered=False)
+
+        # Documents that already existed keep their stored ID, so read the IDs back.
+        with manager.track('properties.find'):
+            resolved = {
+                document['file']: document['_id']
+                for document in collection.find(
+                    {'file': {'$in': filenames}}, {'_id': True, 'file': True})
+            }
+        return [(resolved[filename], filename) for filename in filenames if filename in resolved]
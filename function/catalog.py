@@ -0,0 +1,109 @@
+"""
+This module lists stored files from their MongoDB metadata instead of the bucket.
+
+Listing a GCS prefix pages through every blob under it. The metadata documents
+already hold each `file` and its `createAt`, so the catalog is one indexed,
+paginated query. Results are cached per process for a short time, and the
+cache is cleared when this process stores a new file.
+
+The metadata is the catalog, so it is kept: documents have no `expireAt`.
+"""
+from library.libraries import os, re, time, threading
+from function.mongo_manager import get_mongo_manager
+
+CATALOG_TTL = float(os.environ.get('CATALOG_TTL', 30))
+CATALOG_COLLECTIONS = {'listings': 'LISTING_COLLECTION', 'properties': 'PROPERTY_COLLECTION'}
+CATALOG_INDEXES = {
+    'listings': ('createAt', 'state', 'city'),
+    'properties': ('createAt', 'zpid'),
+}
+CATALOG_FIELDS = {'file': True, 'createAt': True, 'kind': True, 'city': True, 'state': True,
+                  'zpid': True, 'rows': True, 'prefix': True}
+DEFAULT_PAGE_SIZE = 50
+
+_CATALOG_LOCK = threading.Lock()
+_CATALOG_CACHE = {}
+
+
+def list_catalog(prefix, state=None, city=None, zpid=None, search=None,
+                 page=0, page_size=DEFAULT_PAGE_SIZE, ttl=CATALOG_TTL):
+    """
+    List stored files, newest first.
+
+    Parameters:
+    - prefix (str): 'listings' or 'properties'.
+    - state (str, optional): Only listings of this state ID.
+    - city (str, optional): Only listings of this city.
+    - zpid (str, optional): Only properties with this ZPID.
+    - search (str, optional): Only files whose name contains this text, case-insensitive.
+    - page (int, optional): The page number, starting at 0.
+    - page_size (int, optional): Files per page.
+    - ttl (float, optional): Seconds a cached page is reused.
+
+    Returns:
+    tuple: (list of metadata documents, True if there is a next page).
+    """
+    query = {}
+    for field_name, value in (('state', state), ('city', city), ('zpid', zpid)):
+        if value:
+            query[field_name] = value
+    if search:
+        query['file'] = {'$regex': re.escape(search), '$options': 'i'}
+
+    key = (prefix, repr(sorted(query.items())), page, page_size)
+    with _CATALOG_LOCK:
+        entry = _CATALOG_CACHE.get(key)
+    if entry and time.monotonic() - entry['cached_at'] < ttl:
+        return entry['result']
+
+    collection_name = os.environ.get(CATALOG_COLLECTIONS[prefix])
+    manager = get_mongo_manager()
+    for index_key in CATALOG_INDEXES[prefix]:
+        manager.ensure_index(collection_name, index_key)
+
+    collection = manager.get_collection(collection_name)
+    with manager.track(f'{prefix}.catalog'):
+        documents = list(
+            collection.find(query, CATALOG_FIELDS)
+            .sort('createAt', -1)
+            .skip(page * page_size)
+            .limit(page_size + 1)
+        )
+    result = (documents[:page_size], len(documents) > page_size)
+
+    with _CATALOG_LOCK:
+        _CATALOG_CACHE[key] = {'result': result, 'cached_at': time.monotonic()}
+    return result
+
+
+def invalidate_catalog(prefix=None):
+    """
+    Drop cached catalog pages.
+
+    Parameters:
+    - prefix (str, optional): Only drop pages of 'listings' or 'properties'.
+    """
+    with _CATALOG_LOCK:
+        for key in list(_CATALOG_CACHE):
+            if prefix is None or key[0] == prefix:
+                del _CATALOG_CACHE[key]
+
+
+def keep_metadata():
+    """
+    Remove `expireAt` from stored metadata, so a TTL index no longer deletes it.
+
+    Documents written before the catalog existed expired after a day.
+
+    Returns:
+    int: The number of documents updated.
+    """
+    manager = get_mongo_manager()
+    updated = 0
+    for variable in CATALOG_COLLECTIONS.values():
+        collection = manager.get_collection(os.environ.get(variable))
+        with manager.track('catalog.keep_metadata'):
+            result = collection.update_many({'expireAt': {'$exists': True}},
+                                            {'$unset': {'expireAt': ''}})
+        updated += result.modified_count
+    return updated
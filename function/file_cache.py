@@ -0,0 +1,184 @@
+"""
+This module provides a local on-disk cache for files stored in Google Cloud Storage.
+
+Entries are content-addressed by bucket, object name and generation. A small
+pointer file records the latest cached generation of each object, so repeat
+reads are served from disk and only revalidated with a conditional GET once
+they are older than `max_age`.
+"""
+from library.libraries import (
+    os, json, time, threading, hashlib, tempfile, gcs_exceptions
+)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'zillow_analysis_cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 300
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LocalFileCache:
+    """
+    Size-bounded LRU cache of GCS objects on local disk.
+
+    Parameters:
+    - directory (str, optional): Cache directory. Defaults to the GCS_CACHE_DIR variable
+      or a folder in the system temp directory.
+    - max_bytes (int, optional): Evict least recently used files above this total size.
+      Defaults to the GCS_CACHE_MAX_BYTES variable or 512 MiB.
+    - max_age (float, optional): Seconds a cached file is served without revalidation.
+      Defaults to the GCS_CACHE_MAX_AGE variable or 300.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None):
+        self.directory = directory or os.environ.get('GCS_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes or os.environ.get('GCS_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_age = float(
+            max_age if max_age is not None else os.environ.get('GCS_CACHE_MAX_AGE', DEFAULT_MAX_AGE))
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def data_path(self, bucket_name, blob_name, generation):
+        """
+        Return the path of a cached object generation.
+
+        Parameters:
+        - bucket_name (str): The name of the bucket.
+        - blob_name (str): The full object name, including the prefix.
+        - generation (int): The object generation.
+
+        Returns:
+        str: The path of the data file.
+        """
+        return os.path.join(
+            self.directory, _digest(f"{bucket_name}/{blob_name}#{generation}") + '.data')
+
+    def _pointer_path(self, bucket_name, blob_name):
+        return os.path.join(self.directory, _digest(f"{bucket_name}/{blob_name}") + '.json')
+
+    def lookup(self, bucket_name, blob_name):
+        """
+        Return the latest cached generation of an object.
+
+        Parameters:
+        - bucket_name (str): The name of the bucket.
+        - blob_name (str): The full object name, including the prefix.
+
+        Returns:
+        dict or None: 'generation', 'validated_at' and 'path', or None if not cached.
+        """
+        try:
+            with open(self._pointer_path(bucket_name, blob_name), encoding='utf-8') as file:
+                pointer = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        path = self.data_path(bucket_name, blob_name, pointer['generation'])
+        if not os.path.exists(path):
+            return None
+        return dict(pointer, path=path)
+
+    def fetch(self, blob):
+        """
+        Return a local path holding the content of the blob, downloading it if needed.
+
+        Parameters:
+        - blob (storage.Blob): The blob to fetch.
+
+        Returns:
+        str or None: The path of the cached file or None if the blob doesn't exist.
+        """
+        bucket_name = blob.bucket.name
+        entry = self.lookup(bucket_name, blob.name)
+        if entry and time.time() - entry['validated_at'] < self.max_age:
+            return self._touch(entry['path'])
+
+        download_kwargs = {}
+        if entry:
+            download_kwargs['if_generation_not_match'] = entry['generation']
+
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                blob.download_to_file(file, **download_kwargs)
+        except gcs_exceptions.NotModified:
+            os.remove(temp_path)
+            self._write_pointer(bucket_name, blob.name, entry['generation'])
+            return self._touch(entry['path'])
+        except gcs_exceptions.NotFound:
+            os.remove(temp_path)
+            return None
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        path = self.data_path(bucket_name, blob.name, blob.generation)
+        os.replace(temp_path, path)
+        self._write_pointer(bucket_name, blob.name, blob.generation)
+        self.evict()
+        return path
+
+    def _write_pointer(self, bucket_name, blob_name, generation):
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+            json.dump({'generation': generation, 'validated_at': time.time()}, file)
+        os.replace(temp_path, self._pointer_path(bucket_name, blob_name))
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return path
+
+    def evict(self):
+        """
+        Remove least recently used data files until the cache fits in `max_bytes`.
+
+        Returns:
+        int: The number of files removed.
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.data'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            return removed
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE = None
+
+
+def get_file_cache():
+    """
+    Return the process-wide file cache, creating it on first use.
+
+    Returns:
+    LocalFileCache: The shared cache.
+    """
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LocalFileCache()
+        return _CACHE
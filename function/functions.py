@@ -5,24 +5,123 @@ specific use cases involving Google Cloud Storage, MongoDB, and property data ma
 import urllib.parse
 from library.libraries import (
     os, base64, json, storage, URLError, re, np, st, datetime,
-    MongoClient, requests, pd, io, timedelta, urllib
+    urllib, threading, time, itertools, tempfile,
+    pymongo, bson, gcs_exceptions
+)
+from function.mongo_manager import get_mongo_manager
+from function.file_cache import get_file_cache
+from function.scraper_client import ScraperResult, get_scraper_client
+from function.response_cache import (
+    get_response_cache, listing_cache_key, property_cache_key
+)
+from function.serialization import (
+    DEFAULT_FILE_FORMAT, content_type, file_extension, file_format_from_name, read_frame,
+    write_frame
 )
-
-API_KEY = os.environ.get('API_KEY')
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/537.36 (KHTML, like Gecko)"
-    )
-}
 
 BUCKET_NAME = os.environ.get('BUCKET_NAME')
 BUCKET_NAME2 = os.environ.get('BUCKET_NAME2')
 
-
-def gcs_connect():
-    """
-    Connect to Google Cloud Storage using the provided environment variable.
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_SPOOL_SIZE = 32 * 1024 * 1024
+RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+# Resumable upload chunks must be a multiple of 256 KiB.
+UPLOAD_CHUNK_SIZE = 32 * 256 * 1024
+
+LOCATION_FILE = "merged_usacities_data.csv"
+LOCATION_COLUMNS = ["SizeRank", "StateName", "City", "Latitude", "Longitude",
+                    "StateID", "RegionID"]
+LOCATION_INDEX_TTL = float(os.environ.get('LOCATION_INDEX_TTL', 3600))
+
+# Marker inserted before the extension of listing snapshot files, by kind.
+SNAPSHOT_KINDS = {'full': '', 'delta': '.delta'}
+
+
+class GCSClientPool:
+    """
+    Process-wide pool holding a single Google Cloud Storage client and a cache
+    of resolved bucket handles.
+
+    Streamlit reruns the page script on every interaction and serves several
+    sessions from the same process, so the client and the buckets are shared
+    behind a lock instead of being rebuilt on each rerun.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._buckets = {}
+        self._stats = {
+            "client_hits": 0, "client_misses": 0,
+            "bucket_hits": 0, "bucket_misses": 0
+        }
+
+    def get_client(self):
+        """
+        Return the pooled storage client, creating it on first use.
+
+        Returns:
+        storage.Client or None: The shared client or None if it could not be created.
+        """
+        with self._lock:
+            if self._client is not None:
+                self._stats["client_hits"] += 1
+                return self._client
+
+            self._stats["client_misses"] += 1
+            self._client = _create_storage_client()
+            return self._client
+
+    def get_bucket(self, bucket_name, storage_client=None):
+        """
+        Return a bucket handle, resolving it with `get_bucket()` only once per client.
+
+        Parameters:
+        - bucket_name (str): The name of the bucket.
+        - storage_client (storage.Client, optional): The client to resolve the bucket with.
+          Defaults to the pooled client.
+
+        Returns:
+        storage.Bucket: The cached bucket handle.
+        """
+        if storage_client is None:
+            storage_client = self.get_client()
+
+        key = (storage_client, bucket_name)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._stats["bucket_hits"] += 1
+                return bucket
+            self._stats["bucket_misses"] += 1
+
+        # Resolve outside the lock so a slow metadata call does not block other sessions.
+        bucket = storage_client.get_bucket(bucket_name)
+        with self._lock:
+            return self._buckets.setdefault(key, bucket)
+
+    def stats(self):
+        """
+        Return a snapshot of the hit/miss counters.
+
+        Returns:
+        dict: Client and bucket hit/miss counts and the number of cached buckets.
+        """
+        with self._lock:
+            return dict(self._stats, cached_buckets=len(self._buckets))
+
+    def reset(self):
+        """Drop the pooled client, the cached buckets and the counters."""
+        with self._lock:
+            self._client = None
+            self._buckets.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+def _create_storage_client():
+    """
+    Create a Google Cloud Storage client from the provided environment variable.
 
     Returns:
     storage_client(storage.Client): A Google Cloud Storage client object or None if an error occurs.
@@ -45,6 +144,35 @@ def gcs_connect():
         return None
 
 
+GCS_POOL = GCSClientPool()
+
+
+def gcs_connect():
+    """
+    Connect to Google Cloud Storage using the provided environment variable.
+
+    The client is created once per process and shared through `GCS_POOL`.
+
+    Returns:
+    storage_client(storage.Client): A Google Cloud Storage client object or None if an error occurs.
+    """
+    return GCS_POOL.get_client()
+
+
+def get_gcs_bucket(storage_client, bucket_name):
+    """
+    Get a bucket handle from the process-wide bucket cache.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - bucket_name (str): The name of the bucket.
+
+    Returns:
+    storage.Bucket: The bucket handle.
+    """
+    return GCS_POOL.get_bucket(bucket_name, storage_client)
+
+
 def safe_int_conversion(value):
     """
     Safely convert the value to an integer.
@@ -124,6 +252,42 @@ def fix_json_string(string):
     return string
 
 
+def decode_nested(value):
+    """
+    Decode a stored nested field (e.g. taxHistory) into Python lists and dicts.
+
+    Parquet files return Arrow list/struct values, which only need converting
+    from NumPy arrays. CSV files hold JSON text, and files written before
+    nested fields were stored as JSON hold Python repr text, which is repaired
+    with `fix_json_string`.
+
+    Parameters:
+    - value (mixed): The stored value.
+
+    Returns:
+    list or dict: The decoded value, or an empty list if it is missing or unreadable.
+    """
+    if isinstance(value, np.ndarray):
+        return [decode_nested(item) if isinstance(item, (np.ndarray, dict)) else item
+                for item in value]
+    if isinstance(value, dict):
+        return {key: decode_nested(item) if isinstance(item, (np.ndarray, dict)) else item
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str):
+        return []
+
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return json.loads(fix_json_string(value))
+    except ValueError:
+        return []
+
+
 def inspect_object_columns(data_frame):
     """
     Inspect columns with object data type and display their unique values.
@@ -161,270 +325,399 @@ def process_object_columns(data_frame):
                 data_frame[column] = data_frame[column].astype(float)
 
 
-def get_listings(listing_url):
+def get_listings(listing_url, use_cache=True):
     """
     Retrieve listing data from the API using the provided URL.
 
     Parameters:
     - listing_url (str): The URL of the property listing.
+    - use_cache (bool, optional): Serve repeated searches from the response cache.
 
     Returns:
-    Response: A Response object containing the retrieved data.
+    ScraperResult: The parsed API response. Unsuccessful if no URL is given.
     """
-    url = "https://app.scrapeak.com/v1/scrapers/zillow/listing"
-    querystring = {
-        "api_key": API_KEY,
-        "url": listing_url
-    }
-    return requests.request("GET", url, params=querystring, headers=HEADERS, timeout=20)
+    if not listing_url:
+        return ScraperResult(is_success=False, message="No listing URL given.")
+    client = get_scraper_client()
+    if not use_cache:
+        return client.get_listings(listing_url)
+    return get_response_cache().get_or_fetch(
+        listing_cache_key(listing_url), lambda: client.get_listings(listing_url))
 
 
-def get_properties(zpid=None, address=None):
+def get_properties(zpid=None, address=None, use_cache=True):
     """
     Retrieve property data from the API using the provided ZPID or address.
 
     Parameters:
     - zpid (str, optional): The ZPID of the property.
     - address (str, optional): The address of the property.
+    - use_cache (bool, optional): Serve repeated lookups from the response cache.
 
     Returns:
-    Response: A Response object containing the retrieved data.
+    ScraperResult: The parsed API response.
     """
-    url = "https://app.scrapeak.com/v1/scrapers/zillow/property"
-    querystring = {
-        "api_key": API_KEY,
-        "zpid": zpid,
-        "address": address
-    }
-    if zpid is not None:
-        querystring['zpid'] = zpid
-    if address is not None:
-        querystring['address'] = address
-    return requests.request("GET", url, params=querystring, headers=HEADERS, timeout=20)
+    client = get_scraper_client()
+    if not use_cache:
+        return client.get_properties(zpid=zpid, address=address)
+    return get_response_cache().get_or_fetch(
+        property_cache_key(zpid, address),
+        lambda: client.get_properties(zpid=zpid, address=address))
 
 
-def listings_save_to_db(data):
+def _upsert_metadata(collection_name, operation, data, object_id):
     """
-    Save the Listing Metadata to MongoDB.
+    Upsert a metadata document keyed by its `file` field in a single round trip.
+
+    The `_id` is generated on the client and only written when the document is
+    inserted, so concurrent saves of the same file converge on one document.
 
     Parameters:
-    - data (dict): The data containing listing metadata.
+    - collection_name (str): The name of the collection.
+    - operation (str): The metric name prefix, e.g. 'listings'.
+    - data (dict): The metadata to set. Must contain the `file` field.
+    - object_id (ObjectId): The id to use if the document is new.
 
     Returns:
-    tuple: A tuple containing the object ID and filename.
+    ObjectId: The id of the stored document.
     """
-    mongo_url = os.environ.get('MONGO_URL')
-    db_name = os.environ.get('DB_NAME')
-    collection_name = os.environ.get('LISTING_COLLECTION')
+    manager = get_mongo_manager()
+    manager.ensure_healthy()
+    collection = manager.get_collection(collection_name)
+    manager.ensure_index(collection_name, 'file', unique=True)
 
-    client = MongoClient(mongo_url)
-    db_client = client[db_name]
-    collection = db_client[collection_name]
+    fields = {key: value for key, value in data.items() if key != '_id'}
+    with manager.track(f'{operation}.find_one_and_update'):
+        document = collection.find_one_and_update(
+            {'file': data['file']},
+            {'$set': fields, '$setOnInsert': {'_id': object_id}},
+            projection={'_id': True},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+    return document['_id']
 
-    data['createAt'] = datetime.now()
-    data['expireAt'] = datetime.now() + timedelta(days=1)
 
-    result = collection.insert_one(data)
-    object_id = result.inserted_id
+def build_listing_metadata(data, file_format=DEFAULT_FILE_FORMAT, kind='full'):
+    """
+    Fill in the file name, format and timestamps of a listing metadata document.
 
+    Parameters:
+    - data (dict): The data containing listing metadata. Updated in place.
+    - file_format (str, optional): The storage format of the file, 'csv' or 'parquet'.
+    - kind (str, optional): 'full' for a complete snapshot, 'delta' for changes only.
+
+    Returns:
+    tuple: A tuple containing the client-generated object ID and filename.
+    """
+    object_id = bson.ObjectId()
     today = datetime.today().strftime('%Y-%m-%d')
-    filename = f"{today}-{object_id}.csv"
+    filename = f"{today}-{object_id}{SNAPSHOT_KINDS[kind]}{file_extension(file_format)}"
 
     data['file'] = filename
-    collection.update_one({'_id': object_id}, {'$set': {'file': filename}})
-
-    client.close()
+    data['format'] = file_format
+    data['kind'] = kind
+    data['createAt'] = datetime.now()
 
     return object_id, filename
 
 
-def properties_save_to_db(data, zpid):
+def build_property_metadata(data, zpid, file_format=DEFAULT_FILE_FORMAT):
     """
-    Save the Property Metadata to MongoDB.
+    Fill in the file name, format and timestamps of a property metadata document.
 
     Parameters:
-    - data (dict): The data containing property metadata.
+    - data (dict): The data containing property metadata. Updated in place.
     - zpid (str): The ZPID of the property.
+    - file_format (str, optional): The storage format of the file, 'csv' or 'parquet'.
 
     Returns:
-    tuple: A tuple containing the object ID and filename.
+    tuple: A tuple containing the client-generated object ID and filename.
     """
-    mongo_url = os.environ.get('MONGO_URL')
-    db_name = os.environ.get('DB_NAME')
-    collection_name = os.environ.get('PROPERTY_COLLECTION')
-
-    client = MongoClient(mongo_url)
-    db_client = client[db_name]
-    collection = db_client[collection_name]
-
     today = datetime.today().strftime('%Y-%m-%d')
-    filename = f"{today}_{zpid}.csv"
+    filename = f"{today}_{zpid}{file_extension(file_format)}"
     data['file'] = filename
+    data['format'] = file_format
+    data['zpid'] = str(zpid)
 
     data['createAt'] = datetime.now()
-    data['expireAt'] = datetime.now() + timedelta(days=1)
 
-    existing_document = collection.find_one({'file': filename})
+    return bson.ObjectId(), filename
+
+
+def listings_save_to_db(data, file_format=DEFAULT_FILE_FORMAT, kind='full'):
+    """
+    Save the Listing Metadata to MongoDB.
+
+    Parameters:
+    - data (dict): The data containing listing metadata.
+    - file_format (str, optional): The storage format of the file, 'csv' or 'parquet'.
+    - kind (str, optional): 'full' for a complete snapshot, 'delta' for changes only.
+
+    Returns:
+    tuple: A tuple containing the object ID and filename.
+    """
+    object_id, filename = build_listing_metadata(data, file_format, kind)
+
+    object_id = _upsert_metadata(
+        os.environ.get('LISTING_COLLECTION'), 'listings', data, object_id)
+
+    return object_id, filename
+
+
+def properties_save_to_db(data, zpid, file_format=DEFAULT_FILE_FORMAT):
+    """
+    Save the Property Metadata to MongoDB.
 
-    if existing_document:
-        object_id = existing_document['_id']
-        collection.update_one({'_id': object_id}, {'$set': data})
-    else:
-        result = collection.insert_one(data)
-        object_id = result.inserted_id
+    A property saved twice on the same day updates the existing document.
 
-    client.close()
+    Parameters:
+    - data (dict): The data containing property metadata.
+    - zpid (str): The ZPID of the property.
+    - file_format (str, optional): The storage format of the file, 'csv' or 'parquet'.
+
+    Returns:
+    tuple: A tuple containing the object ID and filename.
+    """
+    object_id, filename = build_property_metadata(data, zpid, file_format)
+
+    object_id = _upsert_metadata(
+        os.environ.get('PROPERTY_COLLECTION'), 'properties', data, object_id)
 
     return object_id, filename
 
 
-def file_upload_to_gcs(filename, storage_client, prefix, bucket_name=BUCKET_NAME):
+def upload_frame_to_gcs(data, filename, storage_client, prefix, bucket_name=BUCKET_NAME,
+                        file_format=None, metadata=None):
     """
-    Upload a file to a Google Cloud Storage bucket.
+    Serialize a DataFrame in memory and upload it to a Google Cloud Storage bucket.
+
+    Nothing is written to the working directory. Payloads larger than
+    UPLOAD_SPOOL_SIZE spill to an anonymous temporary file that is removed on
+    close, and payloads larger than RESUMABLE_UPLOAD_THRESHOLD are sent as a
+    chunked resumable upload.
 
     Parameters:
-    - filename (str): The name of the file to upload.
+    - data (DataFrame or bytes): The data to upload. Bytes are uploaded as they are.
+    - filename (str): The name of the file in the bucket.
     - storage_client (storage.Client): The Google Cloud Storage client.
     - prefix (str): The folder prefix in the bucket.
     - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - file_format (str, optional): 'csv' or 'parquet'. Defaults to the format of the filename.
+    - metadata (dict, optional): Custom object metadata stored with the file.
 
     Returns:
     str: A message indicating the status of the upload.
     """
-    # Get the bucket name
-    bucket = storage_client.get_bucket(bucket_name)
+    file_format = file_format or file_format_from_name(filename)
+    bucket = get_gcs_bucket(storage_client, bucket_name)
+    blob = bucket.blob(f"{prefix}/{filename}")
+    if metadata:
+        blob.metadata = metadata
 
-    # Create a blob object for the file, it's like a pointer to handle the file upload
-    blob_name = f"{prefix}/{filename}"
-    blob = bucket.blob(blob_name)
+    with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE) as buffer:
+        if isinstance(data, (bytes, bytearray)):
+            buffer.write(data)
+        else:
+            write_frame(data, buffer, file_format)
+        size = buffer.tell()
+        buffer.seek(0)
 
-    # Upload the file to GCS
-    with open(filename, "rb") as file:
-        blob.upload_from_file(file)
+        if size > RESUMABLE_UPLOAD_THRESHOLD:
+            blob.chunk_size = UPLOAD_CHUNK_SIZE
+        blob.upload_from_file(buffer, size=size, content_type=content_type(file_format))
 
     return f"Uploaded {filename} to {bucket_name}/{prefix}."
 
 
-def download_file_from_gcs(filename, storage_client, prefix, bucket_name=BUCKET_NAME):
+def read_frame_from_blob(blob, file_format='csv', usecols=None, dtype=None, chunksize=None,
+                         if_generation_not_match=None):
     """
-    Download a file from a Google Cloud Storage bucket.
+    Parse a CSV or Parquet blob while streaming its bytes, without holding the whole
+    content in memory.
+
+    The download is a single GET. A missing blob raises `NotFound` and, when
+    `if_generation_not_match` is given, an unchanged blob raises `NotModified`
+    without transferring its content. After a successful read `blob.generation`
+    holds the generation that was read.
 
     Parameters:
-    - filename (str): The name of the file to download.
-    - storage_client (storage.Client): The Google Cloud Storage client.
-    - prefix (str): The folder prefix in the bucket.
-    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - blob (storage.Blob): The blob to read.
+    - file_format (str, optional): 'csv' or 'parquet'. Defaults to 'csv'.
+    - usecols (list, optional): Only parse these columns.
+    - dtype (dict, optional): Column dtypes.
+    - chunksize (int, optional): If given, return an iterator of DataFrames with this
+      many rows each instead of a single DataFrame.
+    - if_generation_not_match (int, optional): Only download if the blob generation differs.
 
     Returns:
-    DataFrame or None: A DataFrame containing the downloaded data or None if the file doesn't exist.
+    DataFrame or iterator: The parsed data.
     """
-    bucket = storage_client.get_bucket(bucket_name)
-    blob = bucket.blob(f"{prefix}/{filename}")
+    open_kwargs = {'chunk_size': DOWNLOAD_CHUNK_SIZE}
+    if if_generation_not_match is not None:
+        open_kwargs['if_generation_not_match'] = if_generation_not_match
 
-    if not blob.exists():
-        return None
+    if chunksize is not None:
+        chunks = _iter_blob_chunks(blob, open_kwargs, file_format, usecols, dtype, chunksize)
+        # Pull the first chunk now so NotFound/NotModified surface to the caller.
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return iter(())
+        return itertools.chain([first_chunk], chunks)
 
-    content = blob.download_as_text()
+    with blob.open('rb', **open_kwargs) as file:
+        return read_frame(file, file_format, usecols=usecols, dtype=dtype)
 
-    data_frame = pd.read_csv(io.StringIO(content))
-    return data_frame
+
+def _iter_blob_chunks(blob, open_kwargs, file_format, usecols, dtype, chunksize):
+    """
+    Yield DataFrame chunks of a blob, keeping the download stream open until exhausted.
+    """
+    with blob.open('rb', **open_kwargs) as file:
+        yield from read_frame(file, file_format, usecols=usecols, dtype=dtype,
+                              chunksize=chunksize)
 
 
-def download_location_file_from_gcs(filename, storage_client, bucket_name=BUCKET_NAME2):
+def download_file_from_gcs(filename, storage_client, prefix, bucket_name=BUCKET_NAME,
+                           usecols=None, dtype=None, chunksize=None,
+                           if_generation_not_match=None, use_cache=True):
     """
     Download a file from a Google Cloud Storage bucket.
 
+    The format is taken from the file extension, so legacy CSV files and
+    Parquet files are both read.
+
     Parameters:
     - filename (str): The name of the file to download.
     - storage_client (storage.Client): The Google Cloud Storage client.
     - prefix (str): The folder prefix in the bucket.
     - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - usecols (list, optional): Only parse these columns.
+    - dtype (dict, optional): Column dtypes.
+    - chunksize (int, optional): Return an iterator of DataFrames with this many rows each.
+    - if_generation_not_match (int, optional): Generation of a locally cached copy.
+      If the blob still has this generation, `NotModified` is raised.
+    - use_cache (bool, optional): Serve the file through the local disk cache.
+      Ignored when `if_generation_not_match` is given.
 
     Returns:
     DataFrame or None: A DataFrame containing the downloaded data or None if the file doesn't exist.
     """
-    bucket = storage_client.get_bucket(bucket_name)
-    blob = bucket.blob(filename)
+    bucket = get_gcs_bucket(storage_client, bucket_name)
+    blob = bucket.blob(f"{prefix}/{filename}")
+    file_format = file_format_from_name(filename)
 
-    if not blob.exists():
-        return None
+    if use_cache and if_generation_not_match is None:
+        path = get_file_cache().fetch(blob)
+        if path is None:
+            return None
+        return read_frame(path, file_format, usecols=usecols, dtype=dtype, chunksize=chunksize)
 
-    content = blob.download_as_text()
-    data_frame = pd.read_csv(io.StringIO(content))
-    return data_frame
+    try:
+        return read_frame_from_blob(blob, file_format, usecols=usecols, dtype=dtype,
+                                    chunksize=chunksize,
+                                    if_generation_not_match=if_generation_not_match)
+    except gcs_exceptions.NotFound:
+        return None
 
 
-def list_files_in_gcs(storage_client, prefix, bucket_name=BUCKET_NAME):
+def get_provinces_from_canada(data_frame):
     """
-    List all files in a specific prefix of a Google Cloud Storage bucket.
+    Retrieve unique provinces from the provided DataFrame.
 
     Parameters:
-    - storage_client (storage.Client): The Google Cloud Storage client.
-    - prefix (str): The folder prefix in the bucket.
-    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - data_frame (DataFrame): DataFrame containing the data of cities in Canada.
 
     Returns:
-    list: A list of filenames in the specified prefix.
+    List: A list of unique provinces.
     """
-    bucket = storage_client.get_bucket(bucket_name)
-    blobs = bucket.list_blobs(prefix=prefix)
-    return [blob.name.replace(f"{prefix}/", "") for blob in blobs]
+    return data_frame["province_name"].unique().tolist()
 
 
-def get_states_from_usa(data_frame):
+def get_cities_from_province(data_frame, province_name):
     """
-    Retrieve unique states from the provided DataFrame.
+    Retrieve cities for the specified province.
 
     Parameters:
-    - data_frame (DataFrame): DataFrame containing the data of cities in the USA.
+    - df (DataFrame): DataFrame containing the data of cities in Canada.
+    - province_name (str): Name of the province to retrieve cities for.
 
     Returns:
-    List: A list of unique states.
+    List: A list of cities for the specified province.
     """
-    sorted_dataframe = data_frame.sort_values(by="SizeRank")
-    return sorted_dataframe["StateName"].drop_duplicates().tolist()
+    return data_frame[data_frame["province_name"] == province_name]["city"].tolist()
 
 
-def get_provinces_from_canada(data_frame):
+def build_location_index(data_frame):
     """
-    Retrieve unique provinces from the provided DataFrame.
+    Build lookup tables for the state and city dropdowns.
 
     Parameters:
-    - data_frame (DataFrame): DataFrame containing the data of cities in Canada.
+    - data_frame (DataFrame): DataFrame containing the data of cities in the USA.
 
     Returns:
-    List: A list of unique provinces.
+    dict: 'states' (list of states sorted by SizeRank), 'cities' (state -> list of
+    cities sorted by SizeRank) and 'locations' ((state, city) -> (lat, lng, StateID, RegionID)).
     """
-    return data_frame["province_name"].unique().tolist()
+    sorted_dataframe = data_frame.sort_values(by="SizeRank", kind="stable")
 
+    cities = {}
+    locations = {}
+    for state, city, lat, lng, state_id, region_id in zip(
+            sorted_dataframe["StateName"], sorted_dataframe["City"],
+            sorted_dataframe["Latitude"], sorted_dataframe["Longitude"],
+            sorted_dataframe["StateID"], sorted_dataframe["RegionID"]):
+        cities.setdefault(state, []).append(city)
+        locations.setdefault((state, city), (lat, lng, state_id, region_id))
 
-def get_cities_from_state(data_frame, state_name):
-    """
-    Retrieve cities for the specified state.
+    return {"states": list(cities), "cities": cities, "locations": locations}
 
-    Parameters:
-    - data_frame (DataFrame): DataFrame containing the data of cities in the USA.
-    - state_name (str): Name of the state to retrieve cities for.
 
-    Returns:
-    List: A list of cities for the specified state.
-    """
-    sorted_dataframe = data_frame.sort_values(by="SizeRank")
-    return sorted_dataframe[data_frame["StateName"] == state_name]["City"].tolist()
+_LOCATION_INDEX_LOCK = threading.Lock()
+_LOCATION_INDEX_CACHE = {}
 
 
-def get_cities_from_province(data_frame, province_name):
+def get_location_index(storage_client, filename=LOCATION_FILE, bucket_name=BUCKET_NAME2,
+                       ttl=LOCATION_INDEX_TTL):
     """
-    Retrieve cities for the specified province.
+    Get the location index for a location file, building it once per process.
+
+    Within `ttl` seconds the cached index is returned without any network I/O.
+    After that a conditional GET revalidates it and the file is only transferred
+    again if its generation changed.
 
     Parameters:
-    - df (DataFrame): DataFrame containing the data of cities in Canada.
-    - province_name (str): Name of the province to retrieve cities for.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - filename (str, optional): The name of the location file.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME2.
+    - ttl (float, optional): Seconds the index is trusted without revalidation.
 
     Returns:
-    List: A list of cities for the specified province.
+    dict or None: The index from `build_location_index` or None if the file doesn't exist.
     """
-    return data_frame[data_frame["province_name"] == province_name]["city"].tolist()
+    key = (bucket_name, filename)
+    with _LOCATION_INDEX_LOCK:
+        entry = _LOCATION_INDEX_CACHE.get(key)
+    if entry and time.monotonic() - entry["checked_at"] < ttl:
+        return entry["index"]
+
+    # One conditional GET: the file is only transferred if its generation changed.
+    blob = get_gcs_bucket(storage_client, bucket_name).blob(filename)
+    try:
+        data_frame = read_frame_from_blob(
+            blob, usecols=LOCATION_COLUMNS,
+            if_generation_not_match=entry["generation"] if entry else None)
+        index, generation = build_location_index(data_frame), blob.generation
+    except gcs_exceptions.NotModified:
+        index, generation = entry["index"], entry["generation"]
+    except gcs_exceptions.NotFound:
+        return None
+
+    with _LOCATION_INDEX_LOCK:
+        _LOCATION_INDEX_CACHE[key] = {
+            "index": index, "generation": generation, "checked_at": time.monotonic()
+        }
+    return index
 
 
 def default(obj):
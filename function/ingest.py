@@ -0,0 +1,263 @@
+"""
+Headless batch ingestion of listing searches for many cities.
+
+Runs the same pipeline as the Listings Search page for the largest cities of a
+state, in parallel, without a browser session:
+
+    python -m function.ingest --state CA --top 50
+
+Progress is checkpointed to a JSON file per state and batch after every
+city. A crashed run started again with the same arguments skips the cities
+already stored. The batch defaults to the current date, so the next day's
+run ingests every city again.
+"""
+from library.libraries import (
+    os, sys, json, time, asyncio, threading, tempfile, argparse, datetime, pymongo
+)
+from function.async_scraper_client import AsyncScraperClient
+from function.bulk_writer import MetadataBulkWriter
+from function.functions import gcs_connect, generate_zillow_url, get_location_index
+from function.listing_fetch import fetch_all_listings_async
+from function.pipelines import store_listings
+
+
+def select_cities(location_index, state, top=None):
+    """
+    Select the cities of a state, largest first.
+
+    Parameters:
+    - location_index (dict): The index from `get_location_index`.
+    - state (str): The state name or state ID (e.g. 'CA'), case-insensitive.
+    - top (int, optional): Only keep the first `top` cities by SizeRank.
+
+    Returns:
+    list: (city, state_id, lat, lng, region_id) tuples.
+    """
+    wanted = state.lower()
+    selected = []
+    seen = set()
+    for state_name, state_cities in location_index["cities"].items():
+        for city in state_cities:
+            lat, lng, state_id, region_id = location_index["locations"][(state_name, city)]
+            # A city can appear twice in the location file; keep its first (largest) entry.
+            if wanted in (str(state_name).lower(), str(state_id).lower()) and city not in seen:
+                seen.add(city)
+                selected.append((city, state_id, lat, lng, region_id))
+
+    return selected[:top] if top else selected
+
+
+class Checkpoint:
+    """
+    JSON file recording the outcome of each city, rewritten atomically after every update.
+
+    Parameters:
+    - path (str): The checkpoint file.
+    - restart (bool, optional): Ignore an existing checkpoint.
+    """
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if not restart and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def is_done(self, city):
+        """Return True if the city was stored by an earlier run."""
+        return self.entries.get(city, {}).get('status') == 'done'
+
+    def record(self, city, entry):
+        """Record the outcome of a city and persist the checkpoint."""
+        with self._lock:
+            self.entries[city] = entry
+            directory = os.path.dirname(os.path.abspath(self.path))
+            file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, indent=2, default=str)
+            os.replace(temp_path, self.path)
+
+
+async def ingest_city(city, client, storage_client, incremental=False, writer=None):
+    """
+    Run the listing pipeline for one city.
+
+    Parameters:
+    - city (tuple): (city, state_id, lat, lng, region_id).
+    - client (AsyncScraperClient): The shared, rate-limited API client.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - incremental (bool, optional): Store only the changes since the last snapshot.
+    - writer (MetadataBulkWriter, optional): Buffers the metadata of the stored file.
+
+    Returns:
+    dict: The checkpoint entry for the city.
+    """
+    name, state_id, lat, lng, region_id = city
+    started = time.perf_counter()
+    zillow_url = generate_zillow_url(name, state_id, lat, lng, region_id)
+    try:
+        fetched = await fetch_all_listings_async(client, zillow_url)
+        if fetched is None:
+            return {'status': 'failed', 'error': 'API request was not successful.',
+                    'seconds': time.perf_counter() - started}
+        # Cleaning and uploading block, so they run in a worker thread.
+        stored = await asyncio.to_thread(
+            store_listings, zillow_url, fetched, storage_client, incremental, writer)
+    except Exception as error_message:  # pylint: disable=broad-except
+        return {'status': 'failed', 'error': str(error_message),
+                'seconds': time.perf_counter() - started}
+
+    object_id, filename, num_of_properties, num_of_listings = stored
+    return {'status': 'done', 'object_id': str(object_id), 'file': filename,
+            'total_results': num_of_properties, 'stored_listings': num_of_listings,
+            'seconds': time.perf_counter() - started}
+
+
+async def _ingest_cities(cities, storage_client, workers, incremental, writer, on_entry):
+    """Ingest cities with at most `workers` in progress, all sharing one API client."""
+    slots = asyncio.Semaphore(workers)
+
+    async with AsyncScraperClient() as client:
+        async def ingest(city):
+            async with slots:
+                return city, await ingest_city(city, client, storage_client, incremental, writer)
+
+        for next_done in asyncio.as_completed([ingest(city) for city in cities]):
+            city, entry = await next_done
+            on_entry(city[0], entry)
+
+
+def run(cities, storage_client, checkpoint, workers=4, incremental=False):
+    """
+    Ingest cities concurrently, skipping the ones already in the checkpoint.
+
+    All API requests go through one `AsyncScraperClient`, so SCRAPER_MAX_CONCURRENCY
+    and SCRAPER_RATE_LIMIT bound the whole batch, whatever the number of workers.
+    Metadata is written in batches. A city is only recorded as done in the
+    checkpoint once its metadata document was written.
+
+    Parameters:
+    - cities (list): Tuples from `select_cities`.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - checkpoint (Checkpoint): Records progress.
+    - workers (int, optional): Number of cities processed at the same time.
+    - incremental (bool, optional): Store only the changes since the last snapshot.
+
+    Returns:
+    dict: Counts of done, failed and skipped cities, total results, stored listings
+    and elapsed seconds.
+    """
+    pending = [city for city in cities if not checkpoint.is_done(city[0])]
+    summary = {'done': 0, 'failed': 0, 'skipped': len(cities) - len(pending),
+               'total_results': 0, 'stored_listings': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+
+    lock = threading.Lock()
+    unflushed, flushed = {}, set()
+
+    def record_flushed(written):
+        for _, filename in written:
+            with lock:
+                item = unflushed.pop(filename, None)
+                if item is None:
+                    flushed.add(filename)
+            if item is not None:
+                checkpoint.record(*item)
+
+    def record_entry(name, entry):
+        with lock:
+            waiting = entry['status'] == 'done' and entry['file'] not in flushed
+            if waiting:
+                unflushed[entry['file']] = (name, entry)
+        if not waiting:
+            checkpoint.record(name, entry)
+        summary[entry['status']] += 1
+        summary['total_results'] += entry.get('total_results') or 0
+        summary['stored_listings'] += entry.get('stored_listings') or 0
+        print(f"[{summary['done'] + summary['failed']}/{len(pending)}] {name}: "
+              f"{entry['status']} ({entry['seconds']:.1f}s)")
+
+    writer = MetadataBulkWriter(on_flush=record_flushed)
+    if pending:
+        asyncio.run(_ingest_cities(pending, storage_client, workers, incremental,
+                                   writer, record_entry))
+
+    try:
+        writer.close()
+    except pymongo.errors.PyMongoError as error_message:
+        print(f"Metadata of {len(unflushed)} cities could not be saved: {error_message}")
+        summary['done'] -= len(unflushed)
+        summary['failed'] += len(unflushed)
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Ingest listing searches for many cities.")
+    parser.add_argument('--state', required=True, help="State name or ID, e.g. CA.")
+    parser.add_argument('--top', type=int, default=None,
+                        help="Only ingest the largest N cities by SizeRank.")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Cities processed in parallel (default: 4). API requests are "
+                             "limited by SCRAPER_MAX_CONCURRENCY and SCRAPER_RATE_LIMIT.")
+    parser.add_argument('--batch', default=None,
+                        help="Batch ID the checkpoint belongs to (default: today's date).")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Checkpoint file (default: ingest-<state>-<batch>.json).")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore an existing checkpoint and ingest every city again.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Store only the changes since each city's last snapshot.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the batch ingestion from the command line.
+
+    Returns:
+    int: The process exit code.
+    """
+    args = parse_args(argv)
+
+    storage_client = gcs_connect()
+    if not storage_client:
+        print("Failed to connect to Google Cloud Storage.")
+        return 1
+
+    location_index = get_location_index(storage_client)
+    if location_index is None:
+        print("Location file not found.")
+        return 1
+
+    cities = select_cities(location_index, args.state, args.top)
+    if not cities:
+        print(f"No cities found for state '{args.state}'.")
+        return 1
+
+    batch = args.batch or datetime.today().strftime('%Y-%m-%d')
+    checkpoint = Checkpoint(args.checkpoint or f"ingest-{args.state.lower()}-{batch}.json",
+                            restart=args.restart)
+    summary = run(cities, storage_client, checkpoint, workers=args.workers,
+                  incremental=args.incremental)
+    if summary['skipped'] == len(cities):
+        print(f"Every city was already ingested in batch {batch}. "
+              "Use --restart or another --batch to ingest again.")
+
+    processed = summary['done'] + summary['failed']
+    rate = processed / summary['seconds'] * 60 if summary['seconds'] else 0.0
+    print(
+        f"Done: {summary['done']}, failed: {summary['failed']}, "
+        f"skipped (already done): {summary['skipped']}, "
+        f"listings found: {summary['total_results']}, "
+        f"stored: {summary['stored_listings']}, "
+        f"elapsed: {summary['seconds']:.1f}s, throughput: {rate:.1f} cities/min"
+    )
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+This module answers questions across many stored listing snapshots at once.
+
+Snapshots are selected from the partition paths and manifests in GCS by state,
+city and date, so only matching files are read and no object is listed or
+opened to find them. Files still in the flat `listings/` folder are moved into
+partitions with `migrate_layout`. Their columns are loaded through the
+local file cache into one Arrow table and queried with DuckDB, which computes
+grouped medians of price, price per square foot and price_to_rent_ratio over
+time.
+"""
+from library.libraries import os, pa, pd, duckdb, ThreadPoolExecutor
+from function.partitions import parse_partition, prune_files
+from function.snapshots import materialize_snapshot
+
+GROUP_COLUMNS = ('state', 'city', 'zipcode', 'homeType')
+TIME_BUCKETS = ('day', 'week', 'month')
+ANALYTICS_COLUMNS = ['zpid', 'state', 'city', 'zipcode', 'homeType', 'price',
+                     'livingArea', 'price_to_rent_ratio']
+DEFAULT_WORKERS = 8
+# Snapshots read by one trends query at most; the newest are kept.
+MAX_SNAPSHOTS = int(os.environ.get('TRENDS_MAX_SNAPSHOTS', 90))
+
+
+def _day(value):
+    """Return a date, datetime or date string as 'YYYY-MM-DD', or None."""
+    return pd.Timestamp(value).strftime('%Y-%m-%d') if value else None
+
+
+def select_snapshots(storage_client, state=None, city=None, start=None, end=None, limit=None):
+    """
+    Find the listing snapshots that match the filters.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - state (str, optional): State ID, e.g. 'CA'.
+    - city (str, optional): City name.
+    - start (date or str, optional): The first snapshot date, inclusive.
+    - end (date or str, optional): The last snapshot date, inclusive.
+    - limit (int, optional): Keep the newest `limit` snapshots.
+
+    Returns:
+    list: Documents with the 'file', 'prefix' and 'date' of each snapshot, oldest first.
+    """
+    documents = sorted(
+        ({'file': entry['file'], 'prefix': prefix, 'date': parse_partition(prefix)['date']}
+         for prefix, entry in prune_files(storage_client, state, city, _day(start), _day(end))),
+        key=lambda document: (document['date'], document['file']))
+    return documents[-limit:] if limit else documents
+
+
+def _load_snapshot(document, storage_client):
+    """Load the analytics columns of one snapshot, tagged with its date."""
+    data_frame = materialize_snapshot(document['file'], storage_client, document['prefix'])
+    if data_frame is None:
+        return None
+    data_frame = data_frame.reindex(columns=ANALYTICS_COLUMNS)
+    data_frame['snapshot'] = document['file']
+    data_frame['snapshot_date'] = pd.Timestamp(document['date'])
+    return data_frame
+
+
+def load_snapshots(documents, storage_client, workers=DEFAULT_WORKERS):
+    """
+    Load many snapshots into one columnar table.
+
+    Parameters:
+    - documents (list): Metadata documents from `select_snapshots`.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - workers (int, optional): Files downloaded at the same time.
+
+    Returns:
+    pyarrow.Table or None: The listings of all snapshots, or None if none could be loaded.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = [
+            frame for frame in executor.map(
+                lambda document: _load_snapshot(document, storage_client), documents)
+            if frame is not None
+        ]
+    if not frames:
+        return None
+
+    data_frame = pd.concat(frames, ignore_index=True)
+    for column in ('zpid', 'state', 'city', 'zipcode', 'homeType'):
+        data_frame[column] = data_frame[column].astype('string')
+    for column in ('price', 'livingArea', 'price_to_rent_ratio'):
+        data_frame[column] = pd.to_numeric(data_frame[column], errors='coerce')
+    return pa.Table.from_pandas(data_frame, preserve_index=False)
+
+
+def aggregate_listings(listings, group_by=('city',), time_bucket='day'):
+    """
+    Compute grouped listing statistics over time.
+
+    Parameters:
+    - listings (pyarrow.Table): The table from `load_snapshots`.
+    - group_by (tuple, optional): Columns from GROUP_COLUMNS to group by.
+    - time_bucket (str, optional): 'day', 'week' or 'month'.
+
+    Returns:
+    DataFrame: One row per group and period with the listing count and the median
+    price, price per square foot and price_to_rent_ratio.
+    """
+    unknown = [column for column in group_by if column not in GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f"Cannot group by {unknown}. Choose from {list(GROUP_COLUMNS)}.")
+    if time_bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unknown time bucket '{time_bucket}'. Choose from {list(TIME_BUCKETS)}.")
+
+    keys = ', '.join(['period', *group_by])
+    query = f"""
+        SELECT date_trunc('{time_bucket}', snapshot_date) AS period,
+               {', '.join(group_by) + ',' if group_by else ''}
+               count(DISTINCT zpid) AS listings,
+               median(price) AS median_price,
+               median(price / nullif(livingArea, 0)) AS median_price_per_sqft,
+               median(price_to_rent_ratio) AS median_price_to_rent_ratio
+        FROM listings
+        GROUP BY {keys}
+        ORDER BY {keys}
+    """
+    with duckdb.connect() as connection:
+        connection.register('listings', listings)
+        return connection.execute(query).df()
+
+
+def listing_trends(storage_client, state=None, city=None, start=None, end=None,
+                   group_by=('city',), time_bucket='day', limit=MAX_SNAPSHOTS):
+    """
+    Select, load and aggregate listing snapshots in one call.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - state, city, start, end: Filters passed to `select_snapshots`.
+    - group_by (tuple, optional): Columns from GROUP_COLUMNS to group by.
+    - time_bucket (str, optional): 'day', 'week' or 'month'.
+    - limit (int, optional): Read at most this many of the newest matching snapshots.
+
+    Returns:
+    DataFrame or None: The result of `aggregate_listings`, or None if no snapshot matched.
+    """
+    documents = select_snapshots(storage_client, state, city, start, end, limit)
+    listings = load_snapshots(documents, storage_client)
+    if listings is None:
+        return None
+    return aggregate_listings(listings, group_by, time_bucket)
@@ -0,0 +1,195 @@
+"""
+This module fetches every listing of a search, not only the first capped response.
+
+The listing API returns at most a fixed number of `mapResults` per request,
+while `totalResultCount` reports how many listings match. When a response is
+truncated, its map bounds are split into four quadrants which are fetched
+concurrently, recursively up to `max_depth`, and the results are de-duplicated
+on zpid.
+"""
+from library.libraries import os, json, urllib, asyncio, ThreadPoolExecutor
+from function.functions import get_listings
+
+DEFAULT_MAX_DEPTH = int(os.environ.get('LISTING_SPLIT_DEPTH', 2))
+DEFAULT_WORKERS = 8
+
+
+def parse_search_query_state(listing_url):
+    """
+    Decode the `searchQueryState` of a Zillow search URL.
+
+    Parameters:
+    - listing_url (str): The Zillow search URL.
+
+    Returns:
+    dict: The decoded search query state.
+    """
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(listing_url).query)
+    return json.loads(query['searchQueryState'][0])
+
+
+def listing_url_with_bounds(listing_url, bounds):
+    """
+    Return the search URL restricted to other map bounds.
+
+    Parameters:
+    - listing_url (str): The Zillow search URL.
+    - bounds (dict): 'west', 'east', 'south' and 'north' coordinates.
+
+    Returns:
+    str: The new search URL.
+    """
+    search_query_state = parse_search_query_state(listing_url)
+    search_query_state['mapBounds'] = dict(bounds)
+    encoded_query = urllib.parse.quote(
+        json.dumps(search_query_state, separators=(',', ':')))
+    base_url = listing_url.split('?', 1)[0]
+    return f"{base_url}?searchQueryState={encoded_query}"
+
+
+def split_bounds(bounds):
+    """
+    Split map bounds into four quadrants.
+
+    Parameters:
+    - bounds (dict): 'west', 'east', 'south' and 'north' coordinates.
+
+    Returns:
+    list: Four bounds dicts.
+    """
+    middle_lng = (bounds['west'] + bounds['east']) / 2
+    middle_lat = (bounds['south'] + bounds['north']) / 2
+    return [
+        {'west': west, 'east': east, 'south': south, 'north': north}
+        for west, east in ((bounds['west'], middle_lng), (middle_lng, bounds['east']))
+        for south, north in ((bounds['south'], middle_lat), (middle_lat, bounds['north']))
+    ]
+
+
+def _unpack(result):
+    """
+    Read the listings of one search response.
+
+    Returns:
+    tuple or None: (mapResults, totalResultCount), or None if the call failed.
+    """
+    if not result.is_success:
+        return None
+    data = result.data
+    return (data['cat1']['searchResults']['mapResults'],
+            data['categoryTotals']['cat1']['totalResultCount'])
+
+
+def _split_plan(listing_url, max_depth):
+    """
+    Generator driving the quadrant splitting, independent of how requests are made.
+
+    Yields lists of URLs to fetch and receives their `_unpack` results in the
+    same order. Returns the value of `fetch_all_listings`. Areas still truncated
+    at `max_depth` and failed sub-requests are counted as truncated areas.
+    """
+    (root,) = yield [listing_url]
+    if root is None:
+        return None
+
+    map_results, total_result_count = root
+    records = {}
+    _merge(records, map_results)
+    requests_made = 1
+    truncated_areas = 0
+
+    level = []
+    if len(map_results) < total_result_count:
+        if max_depth > 0:
+            level = [listing_url]
+        else:
+            truncated_areas += 1
+
+    for depth in range(1, max_depth + 1):
+        if not level:
+            break
+        urls = [
+            listing_url_with_bounds(url, bounds)
+            for url in level
+            for bounds in split_bounds(parse_search_query_state(url)['mapBounds'])
+        ]
+        level = []
+        fetched_level = yield urls
+        for url, fetched in zip(urls, fetched_level):
+            requests_made += 1
+            if fetched is None:
+                truncated_areas += 1
+                continue
+            sub_results, sub_total = fetched
+            _merge(records, sub_results)
+            if len(sub_results) < sub_total:
+                if depth < max_depth:
+                    level.append(url)
+                else:
+                    truncated_areas += 1
+
+    return list(records.values()), total_result_count, requests_made, truncated_areas
+
+
+def fetch_all_listings(listing_url, max_depth=DEFAULT_MAX_DEPTH, workers=DEFAULT_WORKERS):
+    """
+    Fetch all listings of a search by splitting truncated map areas into quadrants.
+
+    Requests go through `get_listings` and its response cache. Batch jobs use
+    `fetch_all_listings_async` with a shared, rate-limited client instead.
+
+    Parameters:
+    - listing_url (str): The Zillow search URL, e.g. from `generate_zillow_url`.
+    - max_depth (int, optional): How many times an area may be split.
+      Defaults to the LISTING_SPLIT_DEPTH variable or 2. 0 fetches only the given bounds.
+    - workers (int, optional): Sub-requests run at the same time.
+
+    Returns:
+    tuple or None: (mapResults de-duplicated on zpid, totalResultCount of the full search,
+    number of requests made, number of areas whose listings are incomplete because
+    they were still truncated at `max_depth` or their request failed), or None if
+    the first request failed.
+    """
+    def fetch(url):
+        return _unpack(get_listings(listing_url=url))
+
+    plan = _split_plan(listing_url, max_depth)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            urls = next(plan)
+            while True:
+                urls = plan.send(list(executor.map(fetch, urls)))
+        except StopIteration as done:
+            return done.value
+
+
+async def fetch_all_listings_async(client, listing_url, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Fetch all listings of a search like `fetch_all_listings`, through an async client.
+
+    Concurrency and request rate are bounded by the client, so many searches
+    can share one `AsyncScraperClient` without exceeding the API quota.
+
+    Parameters:
+    - client (AsyncScraperClient): An open client.
+    - listing_url (str): The Zillow search URL.
+    - max_depth (int, optional): How many times an area may be split.
+
+    Returns:
+    tuple or None: See `fetch_all_listings`.
+    """
+    plan = _split_plan(listing_url, max_depth)
+    try:
+        urls = next(plan)
+        while True:
+            results = await asyncio.gather(*(client.get_listings(url) for url in urls))
+            urls = plan.send([_unpack(result) for result in results])
+    except StopIteration as done:
+        return done.value
+
+
+def _merge(records, map_results):
+    """Add records keyed by zpid, keeping the first occurrence."""
+    for record in map_results:
+        zpid = record.get('zpid') or (record.get('hdpData') or {}).get('homeInfo', {}).get('zpid')
+        records.setdefault(str(zpid) if zpid is not None else id(record), record)
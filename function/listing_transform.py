@@ -0,0 +1,183 @@
+"""
+This module turns the raw `mapResults` of a listing search into the stored listing table.
+
+It only depends on pandas/numpy, so it can be benchmarked and reused by batch
+jobs outside Streamlit.
+"""
+from library.libraries import pd, np
+
+ZILLOW_BASE_URL = "https://www.zillow.com"
+
+LISTING_COLUMNS = [
+    "zpid", "imgSrc", "detailUrl", "streetAddress", "zipcode", "city",
+    "state", "latitude", "longitude", "price", "bathrooms", "bedrooms",
+    "homeType", "homeStatus", "daysOnZillow", "isFeatured", "shouldHighlight",
+    "is_FSBA", "isUnmappable", "isPreforeclosureAuction", "homeStatusForHDP",
+    "priceForHDP", "isNonOwnerOccupied", "isPremierBuilder", "isZillowOwned",
+    "currency", "country", "lotAreaValue", "lotAreaUnit", "isShowcaseListing",
+    "taxAssessedValue", "rentZestimate", "zestimate", "datePriceChanged",
+    "livingArea", "priceReduction", "priceChange", "streetName", "homeDetailUrl",
+    "price_to_rent_ratio"
+]
+
+# Columns parsed as numbers; values that are not numbers become NaN.
+LISTING_NUMERIC_COLUMNS = [
+    "latitude", "longitude", "bathrooms", "bedrooms", "daysOnZillow", "priceForHDP",
+    "lotAreaValue", "taxAssessedValue", "rentZestimate", "zestimate", "livingArea",
+    "priceChange"
+]
+
+# Declared schema of the flattened records: (column, sources in order of precedence,
+# dtype). `build_listing_frame` reads each column from the first source that has it.
+# Top-level fields win over their hdpData.homeInfo duplicates, as they did with
+# pd.json_normalize.
+TOP_LEVEL = 'top'
+HOME_INFO = 'homeInfo'
+SOURCE_ORDER = (TOP_LEVEL, HOME_INFO)
+LISTING_SCHEMA = [
+    (column, (TOP_LEVEL, HOME_INFO),
+     'float64' if column in LISTING_NUMERIC_COLUMNS else 'object')
+    for column in LISTING_COLUMNS
+]
+FSBA_COLUMN = 'listing_sub_type.is_FSBA'
+
+# Matches prices shown as a range ("From $300,000"), which are not stored.
+PRICE_RANGE_PATTERN = r'From'
+PRICE_STRIP_PATTERN = r'[^0-9]'
+
+
+def transform_listings(map_results):
+    """
+    Turn the `mapResults` of a listing search into the stored listing table.
+
+    Parameters:
+    - map_results (list): The raw `cat1.searchResults.mapResults` records.
+
+    Returns:
+    DataFrame: The cleaned listings, with the columns of LISTING_COLUMNS that exist.
+    """
+    return clean_listings(build_listing_frame(map_results))
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_listing_frame(map_results):
+    """
+    Extract the schema columns from raw `mapResults` records in a single pass.
+
+    Only the columns in LISTING_SCHEMA are read, straight into preallocated
+    NumPy arrays, instead of flattening every nested key with `pd.json_normalize`.
+    Columns that no record has are left out, as `pd.json_normalize` would.
+
+    Parameters:
+    - map_results (list): The raw `cat1.searchResults.mapResults` records.
+
+    Returns:
+    DataFrame: The flattened records, including `listing_sub_type.is_FSBA` if present.
+    """
+    size = len(map_results)
+    arrays = {}
+    present = set()
+    for column, _, dtype in LISTING_SCHEMA:
+        if dtype == 'float64':
+            arrays[column] = np.full(size, np.nan, dtype='float64')
+        else:
+            arrays[column] = np.full(size, np.nan, dtype=object)
+    fsba = np.full(size, np.nan, dtype=object)
+    has_fsba = False
+    # Resolve each column's sources to positions in the per-record `containers` tuple.
+    plan = [
+        (column, tuple(SOURCE_ORDER.index(source) for source in sources), dtype == 'float64')
+        for column, sources, dtype in LISTING_SCHEMA
+    ]
+
+    for row, record in enumerate(map_results):
+        home_info = (record.get('hdpData') or {}).get('homeInfo') or {}
+        containers = (record, home_info)
+        for column, source_indexes, is_float in plan:
+            for index in source_indexes:
+                if column in containers[index]:
+                    value = containers[index][column]
+                    break
+            else:
+                continue
+            present.add(column)
+            arrays[column][row] = _as_float(value) if is_float else value
+
+        sub_type = record.get('listing_sub_type') or home_info.get('listing_sub_type')
+        if isinstance(sub_type, dict) and 'is_FSBA' in sub_type:
+            fsba[row] = sub_type['is_FSBA']
+            has_fsba = True
+
+    columns = {column: arrays[column] for column, _, _ in LISTING_SCHEMA if column in present}
+    if has_fsba:
+        columns[FSBA_COLUMN] = fsba
+    return pd.DataFrame(columns, index=pd.RangeIndex(size))
+
+
+def clean_listings(raw):
+    """
+    Clean flattened listing records.
+
+    Rows priced as a range are dropped, `price` is parsed once into int64 and
+    `price_to_rent_ratio` is (price + priceChange) / rentZestimate, using
+    priceChange only where it is present.
+
+    Parameters:
+    - raw (DataFrame): Flattened records with `hdpData.homeInfo.` removed from the
+      column names and `listing_sub_type.is_FSBA` as a column if present.
+
+    Returns:
+    DataFrame: The cleaned listings.
+    """
+    data_frame = pd.DataFrame(
+        {column: raw[column] for column in LISTING_COLUMNS if column in raw.columns},
+        index=raw.index)
+    if FSBA_COLUMN in raw.columns:
+        data_frame['is_FSBA'] = raw[FSBA_COLUMN]
+    else:
+        data_frame['is_FSBA'] = np.nan
+
+    if 'price' not in data_frame.columns or data_frame.empty:
+        return data_frame.iloc[0:0].reindex(
+            columns=[column for column in LISTING_COLUMNS if column in data_frame.columns]
+            + ['price_to_rent_ratio'])
+
+    price = data_frame['price']
+    if pd.api.types.is_numeric_dtype(price):
+        keep = price.notna()
+    else:
+        price = price.astype(str)
+        keep = ~price.str.contains(PRICE_RANGE_PATTERN, na=False)
+        price = price.str.replace(PRICE_STRIP_PATTERN, '', regex=True)
+    data_frame = data_frame[keep].copy()
+    data_frame['price'] = price[keep].astype('int64')
+
+    for column in LISTING_NUMERIC_COLUMNS:
+        if column in data_frame.columns:
+            data_frame[column] = pd.to_numeric(data_frame[column], errors='coerce')
+
+    if 'rentZestimate' in data_frame.columns:
+        numerator = data_frame['price']
+        if 'priceChange' in data_frame.columns:
+            numerator = numerator + data_frame['priceChange'].fillna(0)
+        data_frame['price_to_rent_ratio'] = numerator / data_frame['rentZestimate']
+    else:
+        data_frame['price_to_rent_ratio'] = np.nan
+    data_frame['price_to_rent_ratio'] = data_frame['price_to_rent_ratio'].astype('float64')
+
+    if 'streetAddress' in data_frame.columns:
+        data_frame['streetName'] = data_frame['streetAddress']
+    if 'homeDetailUrl' in data_frame.columns:
+        data_frame['homeDetailUrl'] = ZILLOW_BASE_URL + data_frame['homeDetailUrl']
+
+    for column in ('zipcode', 'zpid'):
+        if column in data_frame.columns:
+            data_frame[column] = data_frame[column].astype(str)
+
+    return data_frame[[column for column in LISTING_COLUMNS if column in data_frame.columns]]
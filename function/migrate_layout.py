@@ -0,0 +1,241 @@
+"""
+Move flat listing files into the partitioned layout of `function.partitions`.
+
+    python -m function.migrate_layout --dry-run
+    python -m function.migrate_layout --delete-source
+
+The files directly under `listings/` are listed from the bucket, so files
+whose metadata document has expired are moved too. The state and city are
+read from each file's rows and the date from its name. Each object is copied
+inside the bucket to its partition, the partition manifest is updated, the
+metadata document is updated if there is one, and with `--delete-source` the
+flat object is deleted. Moved and skipped objects are marked in their object
+metadata, so a run that is started again does not download them a second time.
+"""
+from library.libraries import os, re, sys, argparse, time
+from function.catalog import keep_metadata
+from function.functions import BUCKET_NAME, download_file_from_gcs, gcs_connect, get_gcs_bucket
+from function.mongo_manager import get_mongo_manager
+from function.partitions import manifest_entry, partition_prefix, update_manifest
+from function.serialization import FILE_FORMATS
+from function.snapshots import FULL_SNAPSHOT_EVERY, is_delta
+
+FLAT_PREFIX = 'listings'
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+MIGRATED_KEY = 'migratedTo'
+SKIPPED_KEY = 'migrationSkipped'
+
+
+def _most_common(data_frame, column):
+    """Return the most frequent value of a column, or None."""
+    if column not in data_frame.columns:
+        return None
+    values = data_frame[column].dropna().astype(str)
+    return values.mode().iloc[0] if not values.empty else None
+
+
+def _mark(blob, key, value):
+    """Record the migration status of a flat object in its object metadata."""
+    blob.metadata = dict(blob.metadata or {}, **{key: value})
+    blob.patch()
+
+
+def flat_files(storage_client, bucket_name=BUCKET_NAME):
+    """
+    List the listing files stored directly under the flat prefix.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+
+    Returns:
+    generator: The blobs, without partition folders and manifests.
+    """
+    bucket = get_gcs_bucket(storage_client, bucket_name)
+    iterator = bucket.list_blobs(prefix=f"{FLAT_PREFIX}/", delimiter='/')
+    extensions = tuple(FILE_FORMATS.values())
+    for page in iterator.pages:
+        for blob in page:
+            if blob.name.endswith(extensions):
+                yield blob
+
+
+def _partition_values(blob, filename, data_frame, document):
+    """Return the state, city and date of a flat file. Unknown values are None."""
+    state = _most_common(data_frame, 'state') or document.get('state')
+    city = _most_common(data_frame, 'city') or document.get('city')
+    date_match = DATE_PATTERN.match(filename)
+    created_at = document.get('createAt') or getattr(blob, 'time_created', None)
+    date = date_match.group() if date_match else (
+        created_at.strftime('%Y-%m-%d') if created_at else None)
+    return state, city, date
+
+
+def _find_document(filename):
+    """Return the metadata document of a listing file, or None."""
+    manager = get_mongo_manager()
+    collection = manager.get_collection(os.environ.get('LISTING_COLLECTION'))
+    with manager.track('listings.find_one'):
+        return collection.find_one({'file': filename})
+
+
+def migrate_file(blob, storage_client, bucket_name=BUCKET_NAME, dry_run=False,
+                 delete_source=False):
+    """
+    Move one flat listing file into its partition.
+
+    Parameters:
+    - blob (storage.Blob): The flat object, from `flat_files`.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - dry_run (bool, optional): Only report the new location.
+    - delete_source (bool, optional): Delete the flat object after the move.
+
+    Returns:
+    tuple: (status, message). Status is 'moved', 'planned' or 'skipped'.
+    """
+    filename = blob.name[len(FLAT_PREFIX) + 1:]
+    metadata = blob.metadata or {}
+    if metadata.get(MIGRATED_KEY) or metadata.get(SKIPPED_KEY):
+        return 'skipped', (f"{filename}: already "
+                           f"{'moved' if metadata.get(MIGRATED_KEY) else 'skipped'}")
+
+    data_frame = download_file_from_gcs(filename, storage_client, FLAT_PREFIX,
+                                        bucket_name=bucket_name)
+    if data_frame is None:
+        return 'skipped', f"{filename}: object not found"
+
+    document = _find_document(filename) or {}
+    state, city, date = _partition_values(blob, filename, data_frame, document)
+    if not state or not city or not date:
+        if not dry_run:
+            _mark(blob, SKIPPED_KEY, 'region or date unknown')
+        return 'skipped', f"{filename}: region or date unknown"
+
+    prefix = partition_prefix(state, city, date)
+    if dry_run:
+        return 'planned', f"{filename} -> {prefix}/"
+
+    kind = 'delta' if is_delta(filename) else 'full'
+    # Without metadata the length of a delta chain is unknown; the next run stores a full file.
+    chain_length = document.get('chainLength', FULL_SNAPSHOT_EVERY if kind == 'delta' else 0)
+    bucket = get_gcs_bucket(storage_client, bucket_name)
+    bucket.copy_blob(blob, bucket, f"{prefix}/{filename}")
+    update_manifest(storage_client, prefix,
+                    manifest_entry(filename, data_frame, kind, chain_length),
+                    bucket_name=bucket_name)
+
+    if document:
+        manager = get_mongo_manager()
+        collection = manager.get_collection(os.environ.get('LISTING_COLLECTION'))
+        with manager.track('listings.update_one'):
+            collection.update_one({'_id': document['_id']},
+                                  {'$set': {'prefix': prefix, 'state': state, 'city': city}})
+
+    if delete_source:
+        blob.delete()
+    else:
+        _mark(blob, MIGRATED_KEY, prefix)
+    return 'moved', f"{filename} -> {prefix}/"
+
+
+def mark_missing_documents(flat_names):
+    """
+    Mark metadata documents without a partition whose flat object does not exist.
+
+    Parameters:
+    - flat_names (set): The names of the files under the flat prefix.
+
+    Returns:
+    int: The number of documents marked.
+    """
+    manager = get_mongo_manager()
+    collection = manager.get_collection(os.environ.get('LISTING_COLLECTION'))
+    query = {'prefix': {'$exists': False}, SKIPPED_KEY: {'$exists': False}}
+    with manager.track('listings.find'):
+        missing = [document['file'] for document in collection.find(query, {'file': True})
+                   if document['file'] not in flat_names]
+    if not missing:
+        return 0
+    with manager.track('listings.update_many'):
+        collection.update_many({'file': {'$in': missing}},
+                               {'$set': {SKIPPED_KEY: 'object not found'}})
+    return len(missing)
+
+
+def run(storage_client, bucket_name=BUCKET_NAME, dry_run=False, delete_source=False,
+        limit=None):
+    """
+    Migrate every listing file that has no partition yet.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - dry_run (bool, optional): Only report the new locations.
+    - delete_source (bool, optional): Delete the flat objects after the move.
+    - limit (int, optional): Migrate at most this many files.
+
+    Returns:
+    dict: Counts of moved, planned and skipped files, of metadata documents whose
+    object is missing ('missing') or whose expiry was removed ('kept'), and elapsed seconds.
+    """
+    summary = {'moved': 0, 'planned': 0, 'skipped': 0, 'missing': 0, 'kept': 0,
+               'seconds': 0.0}
+    started = time.perf_counter()
+    flat_names = set()
+    for blob in flat_files(storage_client, bucket_name):
+        flat_names.add(blob.name[len(FLAT_PREFIX) + 1:])
+        if limit and summary['moved'] + summary['planned'] >= limit:
+            continue
+        status, message = migrate_file(blob, storage_client, bucket_name,
+                                       dry_run, delete_source)
+        summary[status] += 1
+        print(f"{status}: {message}")
+
+    if not dry_run:
+        summary['missing'] = mark_missing_documents(flat_names)
+        summary['kept'] = keep_metadata()
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Move flat listing files into the partitioned layout.")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Only print where each file would be moved.")
+    parser.add_argument('--delete-source', action='store_true',
+                        help="Delete the flat objects after they were copied.")
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Migrate at most this many files.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the migration from the command line.
+
+    Returns:
+    int: The process exit code.
+    """
+    args = parse_args(argv)
+
+    storage_client = gcs_connect()
+    if not storage_client:
+        print("Failed to connect to Google Cloud Storage.")
+        return 1
+
+    summary = run(storage_client, dry_run=args.dry_run, delete_source=args.delete_source,
+                  limit=args.limit)
+    print(
+        f"Moved: {summary['moved']}, planned: {summary['planned']}, "
+        f"skipped: {summary['skipped']}, missing objects: {summary['missing']}, "
+        f"metadata kept: {summary['kept']}, elapsed: {summary['seconds']:.1f}s"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+This module provides a shared, long-lived MongoDB connection manager.
+
+A single `MongoClient` (and its connection pool) is created lazily per process
+and reused by every save and read path, instead of opening a new client and
+paying the TCP/TLS handshake and server discovery on each call.
+"""
+from library.libraries import (
+    os, time, threading, contextmanager, pymongo
+)
+
+DEFAULT_MAX_POOL_SIZE = 10
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+
+
+class MongoConnectionManager:
+    """
+    Lazily create and share one MongoDB client per process.
+
+    Parameters:
+    - mongo_url (str, optional): The connection string. Defaults to the MONGO_URL variable.
+    - db_name (str, optional): The database name. Defaults to the DB_NAME variable.
+    - max_pool_size (int, optional): Maximum connections kept in the pool.
+      Defaults to the MONGO_MAX_POOL_SIZE variable or 10.
+    - min_pool_size (int, optional): Minimum connections kept open in the pool.
+    - health_check_interval (float, optional): Seconds a successful ping is trusted for.
+    - client_factory (callable, optional): Builds the client. Defaults to `pymongo.MongoClient`.
+      Pass `mongomock.MongoClient` to run against an in-memory server.
+    - client_options (dict): Extra keyword arguments for the client factory.
+    """
+
+    def __init__(self, mongo_url=None, db_name=None, max_pool_size=None, min_pool_size=0,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+                 client_factory=None, **client_options):
+        self.mongo_url = mongo_url or os.environ.get('MONGO_URL')
+        self.db_name = db_name or os.environ.get('DB_NAME')
+        self.max_pool_size = int(
+            max_pool_size or os.environ.get('MONGO_MAX_POOL_SIZE', DEFAULT_MAX_POOL_SIZE))
+        self.min_pool_size = min_pool_size
+        self.health_check_interval = health_check_interval
+        self._client_factory = client_factory or pymongo.MongoClient
+        self._client_options = client_options
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._last_healthy_at = None
+        self._metrics = {}
+        self._indexes = set()
+        self._index_errors = {}
+
+    @property
+    def client(self):
+        """
+        Return the shared client, creating it on first use.
+
+        Returns:
+        MongoClient: The pooled client.
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory(
+                    self.mongo_url,
+                    maxPoolSize=self.max_pool_size,
+                    minPoolSize=self.min_pool_size,
+                    **self._client_options
+                )
+            return self._client
+
+    def get_database(self):
+        """
+        Return the configured database.
+
+        Returns:
+        Database: The database handle.
+        """
+        return self.client[self.db_name]
+
+    def get_collection(self, collection_name):
+        """
+        Return a collection from the configured database.
+
+        Parameters:
+        - collection_name (str): The name of the collection.
+
+        Returns:
+        Collection: The collection handle.
+        """
+        return self.get_database()[collection_name]
+
+    def ensure_index(self, collection_name, key, unique=False):
+        """
+        Create an index once per process. Later calls for the same index are no-ops.
+
+        An index the server rejects (e.g. existing duplicate documents block a
+        unique index) is reported once and not retried until the client is
+        closed; see `index_errors`. Connection errors are retried on the next call.
+
+        Parameters:
+        - collection_name (str): The name of the collection.
+        - key (str): The field to index.
+        - unique (bool, optional): Whether the index enforces unique values.
+
+        Returns:
+        bool: True if the index exists, False if it could not be created
+        (e.g. existing duplicate documents block a unique index).
+        """
+        index = (collection_name, key, unique)
+        if index in self._indexes:
+            return True
+        if index in self._index_errors:
+            return False
+
+        try:
+            with self.track('create_index'):
+                self.get_collection(collection_name).create_index(key, unique=unique)
+        except pymongo.errors.OperationFailure as error_message:
+            with self._lock:
+                self._index_errors[index] = str(error_message)
+            print(f"Could not create index on {collection_name}.{key}, "
+                  f"not retrying until reconnect: {error_message}")
+            return False
+        except pymongo.errors.PyMongoError as error_message:
+            print(f"Could not create index on {collection_name}.{key}: {error_message}")
+            return False
+
+        with self._lock:
+            self._indexes.add(index)
+        return True
+
+    def index_errors(self):
+        """
+        Return the indexes the server refused to create, e.g. because of duplicate documents.
+
+        Returns:
+        dict: The error message per (collection name, key, unique) index.
+        """
+        with self._lock:
+            return dict(self._index_errors)
+
+    def health_check(self, force=False):
+        """
+        Ping the server, reusing a recent successful result unless `force` is set.
+
+        On failure the client is dropped so the next call reconnects.
+
+        Parameters:
+        - force (bool, optional): Ping even if the last check is still fresh.
+
+        Returns:
+        bool: True if the server answered the ping.
+        """
+        now = time.monotonic()
+        if (not force and self._last_healthy_at is not None
+                and now - self._last_healthy_at < self.health_check_interval):
+            return True
+
+        try:
+            with self.track('ping'):
+                self.client.admin.command('ping')
+        except pymongo.errors.PyMongoError:
+            self.close()
+            return False
+
+        self._last_healthy_at = now
+        return True
+
+    def ensure_healthy(self):
+        """
+        Make sure the server is reachable before a write.
+
+        A failed ping drops the client, so a second ping runs on a new connection.
+
+        Raises:
+        ConnectionError: If the server does not answer either ping.
+        """
+        if self.health_check() or self.health_check(force=True):
+            return
+        raise ConnectionError(f"MongoDB is not reachable (database '{self.db_name}').")
+
+    @contextmanager
+    def track(self, operation):
+        """
+        Record the latency of the wrapped operation under the given name.
+
+        Parameters:
+        - operation (str): The metric name, e.g. 'listings.insert_one'.
+        """
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                metric = self._metrics.setdefault(
+                    operation, {'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+                metric['count'] += 1
+                metric['errors'] += int(failed)
+                metric['total_seconds'] += elapsed
+                metric['max_seconds'] = max(metric['max_seconds'], elapsed)
+
+    def metrics(self):
+        """
+        Return a snapshot of the per-operation latency metrics.
+
+        Returns:
+        dict: Count, errors, total, average and maximum seconds per operation.
+        """
+        with self._lock:
+            return {
+                operation: dict(metric, avg_seconds=metric['total_seconds'] / metric['count'])
+                for operation, metric in self._metrics.items()
+            }
+
+    def close(self):
+        """Close the client. The next use creates a new one."""
+        with self._lock:
+            client, self._client = self._client, None
+            self._last_healthy_at = None
+            self._indexes.clear()
+            self._index_errors.clear()
+        if client is not None:
+            client.close()
+
+
+_MANAGER_LOCK = threading.Lock()
+_MANAGER = None
+
+
+def get_mongo_manager():
+    """
+    Return the process-wide connection manager, creating it on first use.
+
+    Returns:
+    MongoConnectionManager: The shared manager.
+    """
+    global _MANAGER  # pylint: disable=global-statement
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = MongoConnectionManager()
+        return _MANAGER
+
+
+def set_mongo_manager(manager):
+    """
+    Replace the process-wide connection manager, e.g. with one built on mongomock.
+
+    Parameters:
+    - manager (MongoConnectionManager or None): The new manager. None resets to the default.
+
+    Returns:
+    MongoConnectionManager or None: The previous manager.
+    """
+    global _MANAGER  # pylint: disable=global-statement
+    with _MANAGER_LOCK:
+        previous, _MANAGER = _MANAGER, manager
+    return previous
@@ -0,0 +1,250 @@
+"""
+This module places listing snapshots in a Hive-style partitioned layout.
+
+    listings/state=CA/city=Los%20Angeles/date=2024-01-31/2024-01-31-<object_id>.parquet
+
+Each partition has a `_manifest.json` with the row count and the min/max of
+the main columns of every file in it. Readers narrow the partitions from the
+path (state, city, date) and the files from the manifest stats, without
+listing every object or opening the data files.
+"""
+from library.libraries import json, urllib, np, pd, gcs_exceptions
+from function.functions import BUCKET_NAME, get_gcs_bucket
+
+PARTITION_ROOT = 'listings'
+PARTITION_KEYS = ('state', 'city', 'date')
+MANIFEST_NAME = '_manifest.json'
+STATS_COLUMNS = ('price', 'livingArea', 'bedrooms', 'bathrooms', 'price_to_rent_ratio',
+                 'zipcode')
+MANIFEST_RETRIES = 5
+
+
+def partition_prefix(state, city, date, root=PARTITION_ROOT):
+    """
+    Return the folder prefix of a partition.
+
+    Parameters:
+    - state (str): The state ID, e.g. 'CA'.
+    - city (str): The city name.
+    - date (str): The snapshot date as 'YYYY-MM-DD'.
+    - root (str, optional): The top-level folder.
+
+    Returns:
+    str: The prefix, without a trailing slash.
+    """
+    values = (state, city, date)
+    return '/'.join([root] + [
+        f"{key}={urllib.parse.quote(str(value), safe='')}"
+        for key, value in zip(PARTITION_KEYS, values)
+    ])
+
+
+def parse_partition(prefix):
+    """
+    Return the partition values of a prefix.
+
+    Parameters:
+    - prefix (str): A prefix from `partition_prefix`.
+
+    Returns:
+    dict: The 'state', 'city' and 'date' values found in the prefix.
+    """
+    values = {}
+    for part in prefix.strip('/').split('/'):
+        key, separator, value = part.partition('=')
+        if separator and key in PARTITION_KEYS:
+            values[key] = urllib.parse.unquote(value)
+    return values
+
+
+def _plain(value):
+    """Turn a numpy scalar into a JSON-serializable value."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def column_stats(data_frame):
+    """
+    Compute the min/max of the stats columns present in a DataFrame.
+
+    Parameters:
+    - data_frame (DataFrame): The stored rows.
+
+    Returns:
+    dict: {column: {'min': value, 'max': value}} for columns with at least one value.
+    """
+    stats = {}
+    for column in STATS_COLUMNS:
+        if column not in data_frame.columns:
+            continue
+        values = data_frame[column].dropna()
+        if column == 'zipcode':
+            values = values.astype(str)
+        else:
+            values = pd.to_numeric(values, errors='coerce').dropna()
+        if not values.empty:
+            stats[column] = {'min': _plain(values.min()), 'max': _plain(values.max())}
+    return stats
+
+
+def manifest_entry(filename, data_frame, kind='full', chain_length=0):
+    """
+    Describe a stored file for the partition manifest.
+
+    Parameters:
+    - filename (str): The name of the file inside the partition.
+    - data_frame (DataFrame): The rows stored in the file.
+    - kind (str, optional): 'full' or 'delta'.
+    - chain_length (int, optional): The number of deltas since the last full snapshot.
+
+    Returns:
+    dict: The manifest entry.
+    """
+    return {'file': filename, 'kind': kind, 'rows': len(data_frame),
+            'chainLength': chain_length, 'stats': column_stats(data_frame)}
+
+
+def read_manifest(storage_client, prefix, bucket_name=BUCKET_NAME):
+    """
+    Read the manifest of a partition.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - prefix (str): The partition prefix.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+
+    Returns:
+    dict or None: The manifest, or None if the partition has none.
+    """
+    blob = get_gcs_bucket(storage_client, bucket_name).blob(f"{prefix}/{MANIFEST_NAME}")
+    try:
+        return json.loads(blob.download_as_bytes())
+    except gcs_exceptions.NotFound:
+        return None
+
+
+def update_manifest(storage_client, prefix, entry, bucket_name=BUCKET_NAME):
+    """
+    Add or replace the entry of a file in the manifest of its partition.
+
+    Concurrent writers are serialized with generation preconditions: a write
+    based on an outdated manifest fails and is retried on the new one.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - prefix (str): The partition prefix.
+    - entry (dict): The entry from `manifest_entry`.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+
+    Returns:
+    dict: The manifest that was written.
+    """
+    bucket = get_gcs_bucket(storage_client, bucket_name)
+    for attempt in range(MANIFEST_RETRIES):
+        # A new blob per attempt, so the read is never pinned to an outdated generation.
+        blob = bucket.blob(f"{prefix}/{MANIFEST_NAME}")
+        try:
+            manifest = json.loads(blob.download_as_bytes())
+            generation = blob.generation
+        except gcs_exceptions.NotFound:
+            manifest, generation = {'partition': parse_partition(prefix), 'files': []}, 0
+
+        files = [item for item in manifest['files'] if item['file'] != entry['file']]
+        manifest['files'] = files + [entry]
+        manifest['rows'] = sum(item['rows'] for item in manifest['files'])
+
+        try:
+            blob.upload_from_string(json.dumps(manifest, default=str),
+                                    content_type='application/json',
+                                    if_generation_match=generation)
+            return manifest
+        except gcs_exceptions.PreconditionFailed:
+            if attempt == MANIFEST_RETRIES - 1:
+                raise
+    return None
+
+
+def _child_prefixes(bucket, prefix):
+    """List the sub-folders directly below a prefix."""
+    iterator = bucket.list_blobs(prefix=f"{prefix}/", delimiter='/')
+    for _ in iterator.pages:
+        pass
+    return sorted(child.rstrip('/') for child in iterator.prefixes)
+
+
+def list_partitions(storage_client, state=None, city=None, start=None, end=None,
+                    bucket_name=BUCKET_NAME, root=PARTITION_ROOT):
+    """
+    Find the partitions that match the filters.
+
+    Given state and city are used as path segments directly; only the levels
+    below them are listed, one folder level at a time.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - state (str, optional): The state ID.
+    - city (str, optional): The city name.
+    - start (str, optional): The first date, 'YYYY-MM-DD', inclusive.
+    - end (str, optional): The last date, 'YYYY-MM-DD', inclusive.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+    - root (str, optional): The top-level folder.
+
+    Returns:
+    list: The partition prefixes.
+    """
+    bucket = get_gcs_bucket(storage_client, bucket_name)
+    prefixes = [root]
+    for key, value in (('state', state), ('city', city)):
+        if value:
+            prefixes = [f"{prefix}/{key}={urllib.parse.quote(str(value), safe='')}"
+                        for prefix in prefixes]
+        else:
+            prefixes = [child for prefix in prefixes for child in _child_prefixes(bucket, prefix)]
+
+    partitions = []
+    for prefix in prefixes:
+        for child in _child_prefixes(bucket, prefix):
+            date = parse_partition(child).get('date')
+            if date and (not start or date >= start) and (not end or date <= end):
+                partitions.append(child)
+    return partitions
+
+
+def _may_match(stats, ranges):
+    """Return False if the stats prove that no row is inside the ranges."""
+    for column, (low, high) in ranges.items():
+        column_range = stats.get(column)
+        if column_range is None:
+            continue
+        if low is not None and column_range['max'] < low:
+            return False
+        if high is not None and column_range['min'] > high:
+            return False
+    return True
+
+
+def prune_files(storage_client, state=None, city=None, start=None, end=None,
+                ranges=None, bucket_name=BUCKET_NAME):
+    """
+    Find the stored files that may hold matching rows, from paths and manifests only.
+
+    Parameters:
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - state, city, start, end: Partition filters passed to `list_partitions`.
+    - ranges (dict, optional): {column: (low, high)} value ranges; either bound may be None.
+      Full files whose min/max stats lie outside a range are skipped. Deltas are always
+      kept, since their stats only cover the changed rows.
+    - bucket_name (str, optional): The name of the bucket. Defaults to BUCKET_NAME.
+
+    Returns:
+    list: (partition prefix, manifest entry) tuples.
+    """
+    matches = []
+    for prefix in list_partitions(storage_client, state, city, start, end, bucket_name):
+        manifest = read_manifest(storage_client, prefix, bucket_name)
+        if manifest is None:
+            continue
+        matches.extend(
+            (prefix, entry) for entry in manifest['files']
+            if entry.get('kind') == 'delta' or _may_match(entry['stats'], ranges or {})
+        )
+    return matches
@@ -0,0 +1,175 @@
+"""
+This module provides the fetch-transform-persist pipelines behind the search pages.
+
+They have no Streamlit dependencies, so batch jobs can reuse them. Identical
+searches started at the same time are coalesced into one upstream call.
+"""
+from library.libraries import pd, datetime
+from function.catalog import invalidate_catalog
+from function.functions import (
+    get_properties, listings_save_to_db, properties_save_to_db,
+    preprocess_dataframe, upload_frame_to_gcs
+)
+from function.listing_fetch import fetch_all_listings
+from function.listing_transform import transform_listings
+from function.partitions import manifest_entry, partition_prefix, update_manifest
+from function.response_cache import listing_cache_key, property_cache_key
+from function.single_flight import SingleFlight
+from function.snapshots import (
+    FULL_SNAPSHOT_EVERY, base_reference, compute_delta, latest_snapshot, materialize_snapshot,
+    region_from_url
+)
+
+LISTING_FLIGHTS = SingleFlight()
+PROPERTY_FLIGHTS = SingleFlight()
+
+
+def transform_property(data):
+    """
+    Turn the `data` of a property response into the stored property table.
+
+    Nested fields such as taxHistory, priceHistory, nearbyHomes, schools, comps
+    and photos keep their list/dict values, so they are stored as structured
+    columns instead of Python repr strings.
+
+    Parameters:
+    - data (dict): The raw property record.
+
+    Returns:
+    DataFrame: A single-row DataFrame with the required columns.
+    """
+    return preprocess_dataframe(pd.json_normalize(data))
+
+
+def search_and_store_listings(zillow_url, storage_client, incremental=False, writer=None):
+    """
+    Fetch a listing search, save its metadata and upload the cleaned listings.
+
+    Map areas whose results are truncated by the API cap are split and fetched
+    again, so large metros are stored completely.
+
+    Concurrent calls for the same search share one run and one stored file.
+
+    Parameters:
+    - zillow_url (str): The Zillow search URL.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - incremental (bool, optional): Store only the changes since the last snapshot
+      of the same region, see `function.snapshots`.
+    - writer (MetadataBulkWriter, optional): Buffer the metadata in this writer instead
+      of saving it right away. Used by batch jobs.
+
+    Returns:
+    tuple or None: (object_id, filename, total result count), or None if no URL is given
+    or the API call failed.
+    """
+    if not zillow_url:
+        return None
+    return LISTING_FLIGHTS.do(
+        (listing_cache_key(zillow_url), incremental),
+        lambda: _search_and_store_listings(zillow_url, storage_client, incremental, writer))
+
+
+def _search_and_store_listings(zillow_url, storage_client, incremental, writer=None):
+    fetched = fetch_all_listings(zillow_url)
+    if fetched is None:
+        return None
+    return store_listings(zillow_url, fetched, storage_client, incremental, writer)
+
+
+def store_listings(zillow_url, fetched, storage_client, incremental=False, writer=None):
+    """
+    Clean fetched listings, save their metadata and upload them.
+
+    Parameters:
+    - zillow_url (str): The Zillow search URL the listings were fetched for.
+    - fetched (tuple): The result of `fetch_all_listings` or `fetch_all_listings_async`.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - incremental (bool, optional): Store only the changes since the last snapshot.
+    - writer (MetadataBulkWriter, optional): Buffer the metadata in this writer.
+
+    Returns:
+    tuple: (object_id, filename, total result count, number of listings stored).
+    """
+    map_results, num_of_properties, requests_made, truncated_areas = fetched
+    df_listings = transform_listings(map_results)
+    if truncated_areas:
+        print(f"{truncated_areas} map areas were incomplete after splitting; "
+              f"stored {len(df_listings)} of {num_of_properties} listings for {zillow_url}")
+
+    # Prepare data for database saving and get a unique identifier
+    data_for_mongo = {"description": "Listing data for ObjectId generation",
+                      **region_from_url(zillow_url),
+                      'totalResultCount': num_of_properties,
+                      'storedListings': len(df_listings),
+                      'requests': requests_made,
+                      'truncatedAreas': truncated_areas}
+
+    previous = latest_snapshot(data_for_mongo, storage_client) if incremental else None
+    base_frame = None
+    if previous is not None and previous.get('chainLength', 0) < FULL_SNAPSHOT_EVERY:
+        base_frame = materialize_snapshot(previous['file'], storage_client,
+                                          previous.get('prefix', 'listings'))
+
+    object_metadata = None
+    if base_frame is None:
+        kind, stored_frame = 'full', df_listings
+        data_for_mongo.update(rows=len(stored_frame), chainLength=0)
+    else:
+        kind, stored_frame = 'delta', compute_delta(base_frame, df_listings)
+        data_for_mongo.update(rows=len(stored_frame), base=previous['file'],
+                              chainLength=previous.get('chainLength', 0) + 1)
+        # The delta object names its own base, so the chain can be read from GCS alone.
+        object_metadata = base_reference(previous['file'], previous.get('prefix', 'listings'))
+
+    prefix = 'listings'
+    if data_for_mongo['state'] and data_for_mongo['city']:
+        prefix = partition_prefix(data_for_mongo['state'], data_for_mongo['city'],
+                                  datetime.today().strftime('%Y-%m-%d'))
+    data_for_mongo['prefix'] = prefix
+
+    if writer is None:
+        object_id, filename = listings_save_to_db(data_for_mongo, kind=kind)
+    else:
+        object_id, filename = writer.add_listing(data_for_mongo, kind=kind)
+    upload_frame_to_gcs(stored_frame, filename, storage_client, prefix=prefix,
+                        metadata=object_metadata)
+    if prefix != 'listings':
+        update_manifest(storage_client, prefix, manifest_entry(
+            filename, stored_frame, kind, data_for_mongo['chainLength']))
+    invalidate_catalog('listings')
+    return object_id, filename, num_of_properties, len(df_listings)
+
+
+def search_and_store_property(zpid, address, storage_client):
+    """
+    Fetch a property, save its metadata and upload the property details.
+
+    Concurrent calls for the same property share one run and one stored file.
+
+    Parameters:
+    - zpid (str): The ZPID of the property. May be empty if an address is given.
+    - address (str): The address of the property. May be empty if a ZPID is given.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+
+    Returns:
+    tuple or None: (object_id, filename), or None if the API call failed.
+    """
+    return PROPERTY_FLIGHTS.do(
+        property_cache_key(zpid, address),
+        lambda: _search_and_store_property(zpid, address, storage_client))
+
+
+def _search_and_store_property(zpid, address, storage_client):
+    result = get_properties(zpid=zpid, address=address)
+    if not result.is_success:
+        return None
+
+    df_prop = transform_property(result.data)
+
+    data_for_mongo = {"description": "Property data for ObjectId generation"}
+    object_id, filename = properties_save_to_db(
+        data_for_mongo, zpid or result.data.get('zpid'))
+
+    upload_frame_to_gcs(df_prop, filename, storage_client, prefix='properties')
+    invalidate_catalog('properties')
+    return object_id, filename
@@ -0,0 +1,241 @@
+"""
+This module provides a cache for Zillow Scraper API responses.
+
+Responses are keyed by a canonical form of the request (the decoded
+`searchQueryState` of a listing URL, or the ZPID/address of a property) and kept
+in an in-memory LRU tier backed by a local SQLite file. Fresh entries are
+returned without calling the API; entries within the stale window are returned
+immediately while a background thread refreshes them.
+"""
+from library.libraries import (
+    os, json, time, threading, sqlite3, tempfile, OrderedDict, urllib
+)
+from function.scraper_client import ScraperResult
+
+DEFAULT_TTL = float(os.environ.get('SCRAPER_CACHE_TTL', 3600))
+DEFAULT_STALE_TTL = float(os.environ.get('SCRAPER_CACHE_STALE_TTL', 3600))
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_DB_PATH = os.path.join(
+    tempfile.gettempdir(), 'zillow_analysis_cache', 'scraper_responses.sqlite3')
+
+
+def listing_cache_key(listing_url):
+    """
+    Build the cache key of a listing request.
+
+    The `searchQueryState` JSON is decoded and re-encoded with sorted keys, so
+    URLs that differ only in key order or percent-encoding share a key.
+
+    Parameters:
+    - listing_url (str): The Zillow search URL, e.g. from `generate_zillow_url`.
+
+    Returns:
+    str: The cache key.
+
+    Raises:
+    ValueError: If no URL is given.
+    """
+    if not listing_url:
+        raise ValueError("A listing URL is required to build a cache key.")
+    parsed = urllib.parse.urlsplit(listing_url)
+    query = urllib.parse.parse_qs(parsed.query)
+    state = query.pop('searchQueryState', [None])[0]
+    if state is not None:
+        try:
+            state = json.dumps(json.loads(state), sort_keys=True, separators=(',', ':'))
+        except ValueError:
+            pass
+    rest = urllib.parse.urlencode(sorted(query.items()), doseq=True)
+    return f"listing:{parsed.path.lower().rstrip('/')}?{rest}#{state}"
+
+
+def property_cache_key(zpid=None, address=None):
+    """
+    Build the cache key of a property request.
+
+    Parameters:
+    - zpid (str, optional): The ZPID of the property.
+    - address (str, optional): The address of the property.
+
+    Returns:
+    str: The cache key.
+    """
+    if zpid:
+        return f"property:zpid:{str(zpid).strip()}"
+    normalized = ' '.join(str(address or '').lower().replace(',', ' ').split())
+    return f"property:address:{normalized}"
+
+
+class ResponseCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of successful scraper responses.
+
+    Parameters:
+    - ttl (float, optional): Seconds an entry is fresh. Defaults to SCRAPER_CACHE_TTL or 3600.
+    - stale_ttl (float, optional): Seconds after `ttl` during which a stale entry is
+      returned while it is refreshed in the background. Defaults to
+      SCRAPER_CACHE_STALE_TTL or 3600.
+    - max_entries (int, optional): Entries kept in the memory tier.
+    - db_path (str, optional): The SQLite file. Defaults to SCRAPER_CACHE_PATH or a file in
+      the system temp directory.
+    - persistent (bool, optional): Whether to use the SQLite tier. Set to False to keep
+      the cache in memory only.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES, db_path=None, persistent=True):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.db_path = db_path or os.environ.get('SCRAPER_CACHE_PATH', DEFAULT_DB_PATH)
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._refreshing = set()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0}
+
+        if self.persistent:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            with self._connect() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, "
+                    "status_code INTEGER, payload TEXT NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        if not self.persistent:
+            return None
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT stored_at, status_code, payload FROM responses WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+
+        entry = (row[0], row[1], json.loads(row[2]))
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def store(self, key, result):
+        """
+        Store a successful result. Failed results are not cached.
+
+        Parameters:
+        - key (str): The cache key.
+        - result (ScraperResult): The result to store.
+
+        Returns:
+        None
+        """
+        if not result.is_success:
+            return
+        entry = (time.time(), result.status_code, result.payload)
+        self._remember(key, entry)
+        if self.persistent:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, stored_at, status_code, payload) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, entry[0], entry[1], json.dumps(result.payload)))
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return a cached result, calling `fetch` only when there is no usable entry.
+
+        Parameters:
+        - key (str): The cache key.
+        - fetch (callable): Returns a fresh ScraperResult.
+
+        Returns:
+        ScraperResult: The cached or fetched result.
+        """
+        entry = self._load(key)
+        if entry is not None:
+            stored_at, status_code, payload = entry
+            age = time.time() - stored_at
+            result = ScraperResult(is_success=True, data=payload.get('data'),
+                                   status_code=status_code, payload=payload)
+            if age < self.ttl:
+                self._count('hits')
+                return result
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._refresh_in_background(key, fetch)
+                return result
+
+        self._count('misses')
+        result = fetch()
+        self.store(key, result)
+        return result
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.store(key, fetch())
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """
+        Return a snapshot of the hit/miss counters.
+
+        Returns:
+        dict: Fresh hits, stale hits, misses and the size of the memory tier.
+        """
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory))
+
+    def clear(self):
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.persistent:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM responses")
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE = None
+
+
+def get_response_cache():
+    """
+    Return the process-wide response cache, creating it on first use.
+
+    Returns:
+    ResponseCache: The shared cache.
+    """
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+        return _CACHE
@@ -0,0 +1,184 @@
+"""
+This module provides the HTTP client for the Zillow Scraper API (app.scrapeak.com).
+
+A single `requests.Session` with a pooled adapter keeps connections alive
+between calls, retries 429/5xx responses with exponential backoff and parses
+each response body once into a `ScraperResult`.
+"""
+from library.libraries import (
+    os, threading, dataclass, field, requests, urllib3
+)
+
+DEFAULT_BASE_URL = "https://app.scrapeak.com/v1/scrapers/zillow"
+# (connect, read) timeouts in seconds per endpoint.
+DEFAULT_TIMEOUTS = {
+    "listing": (5, 60),
+    "property": (5, 30),
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko)"
+    )
+}
+
+
+@dataclass(frozen=True)
+class ScraperResult:
+    """
+    Parsed response of a scraper API call.
+
+    Attributes:
+    - is_success (bool): Whether the API reported success.
+    - data (dict or None): The 'data' member of the response.
+    - status_code (int): The HTTP status code of the final attempt.
+    - message (str or None): An error message when the call failed.
+    - payload (dict): The full parsed response body.
+    """
+    is_success: bool
+    data: dict = None
+    status_code: int = None
+    message: str = None
+    payload: dict = field(default_factory=dict, repr=False)
+
+    def json(self):
+        """
+        Return the parsed response body, for callers written against `requests.Response`.
+
+        Returns:
+        dict: The full parsed response body.
+        """
+        return self.payload
+
+
+def parse_response(response):
+    """
+    Parse a scraper API response into a `ScraperResult`.
+
+    Parameters:
+    - response (requests.Response or httpx.Response): The HTTP response.
+
+    Returns:
+    ScraperResult: The parsed result.
+    """
+    try:
+        payload = response.json()
+    except ValueError:
+        return ScraperResult(is_success=False, status_code=response.status_code,
+                             message=response.text[:200])
+
+    if not isinstance(payload, dict):
+        return ScraperResult(is_success=False, status_code=response.status_code,
+                             message="Unexpected response body.")
+
+    is_success = bool(payload.get('is_success')) and response.status_code < 400
+    message = None
+    if not is_success:
+        message = payload.get('message') or f"HTTP {response.status_code}"
+    return ScraperResult(is_success=is_success, data=payload.get('data'),
+                         status_code=response.status_code, message=message, payload=payload)
+
+
+class ScraperClient:
+    """
+    Client for the Zillow Scraper API with a shared, pooled session.
+
+    Parameters:
+    - api_key (str, optional): The API key. Defaults to the API_KEY variable.
+    - base_url (str, optional): The API base URL. Defaults to the SCRAPER_BASE_URL variable
+      or the public endpoint, so tests can point it at a local stub server.
+    - timeouts (dict, optional): (connect, read) timeouts per endpoint.
+    - max_retries (int, optional): Retries for connection errors and 429/5xx responses.
+    - backoff_factor (float, optional): Base of the exponential backoff between retries.
+    - pool_maxsize (int, optional): Connections kept alive to the API host.
+    """
+
+    def __init__(self, api_key=None, base_url=None, timeouts=None, max_retries=3,
+                 backoff_factor=0.5, pool_maxsize=10):
+        self.api_key = api_key or os.environ.get('API_KEY')
+        self.base_url = (base_url or os.environ.get('SCRAPER_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+
+        retry = urllib3.util.Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize,
+                                                max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, endpoint, params):
+        """
+        Call an API endpoint.
+
+        Parameters:
+        - endpoint (str): The endpoint name, e.g. 'listing' or 'property'.
+        - params (dict): Query parameters. None values are dropped.
+
+        Returns:
+        ScraperResult: The parsed result.
+        """
+        querystring = {"api_key": self.api_key}
+        querystring.update({key: value for key, value in params.items() if value is not None})
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{endpoint}", params=querystring,
+                timeout=self.timeouts.get(endpoint, (5, 30)))
+        except requests.RequestException as error_message:
+            return ScraperResult(is_success=False, message=str(error_message))
+        return parse_response(response)
+
+    def get_listings(self, listing_url):
+        """
+        Retrieve listing data for a Zillow search URL.
+
+        Parameters:
+        - listing_url (str): The URL of the property listing.
+
+        Returns:
+        ScraperResult: The parsed result.
+        """
+        return self.request("listing", {"url": listing_url})
+
+    def get_properties(self, zpid=None, address=None):
+        """
+        Retrieve property data by ZPID or address.
+
+        Parameters:
+        - zpid (str, optional): The ZPID of the property.
+        - address (str, optional): The address of the property.
+
+        Returns:
+        ScraperResult: The parsed result.
+        """
+        return self.request("property", {"zpid": zpid or None, "address": address or None})
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+
+_CLIENT_LOCK = threading.Lock()
+_CLIENT = None
+
+
+def get_scraper_client():
+    """
+    Return the process-wide scraper client, creating it on first use.
+
+    Returns:
+    ScraperClient: The shared client.
+    """
+    global _CLIENT  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = ScraperClient()
+        return _CLIENT
@@ -0,0 +1,208 @@
+"""
+This module provides the file formats used to store listing and property data.
+
+CSV is kept for legacy files. Parquet (via pyarrow) keeps column types, is
+compressed and lets readers load only the columns they need. The format of a
+stored file is taken from its extension, so legacy CSVs are read transparently.
+"""
+from library.libraries import os, json, pd, np, pa, pq
+
+FILE_FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+CONTENT_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+DEFAULT_FILE_FORMAT = os.environ.get('FILE_FORMAT', 'parquet')
+PARQUET_COMPRESSION = os.environ.get('PARQUET_COMPRESSION', 'zstd')
+
+
+def file_extension(file_format):
+    """
+    Return the file extension for a format.
+
+    Parameters:
+    - file_format (str): 'csv' or 'parquet'.
+
+    Returns:
+    str: The extension, including the dot.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    return FILE_FORMATS[file_format]
+
+
+def content_type(file_format):
+    """
+    Return the MIME type used when uploading a format.
+
+    Parameters:
+    - file_format (str): 'csv' or 'parquet'.
+
+    Returns:
+    str: The content type.
+    """
+    return CONTENT_TYPES.get(file_format, 'application/octet-stream')
+
+
+def file_format_from_name(filename):
+    """
+    Return the format of a stored file from its name. Unknown extensions are read as CSV.
+
+    Parameters:
+    - filename (str): The name of the file.
+
+    Returns:
+    str: 'csv' or 'parquet'.
+    """
+    for file_format, extension in FILE_FORMATS.items():
+        if filename.endswith(extension):
+            return file_format
+    return 'csv'
+
+
+NESTED_TYPES = (list, tuple, dict)
+
+
+def _is_nested(value):
+    """
+    Return True for lists, dicts and the NumPy arrays Parquet reads them back as.
+    """
+    return isinstance(value, (*NESTED_TYPES, np.ndarray))
+
+
+def to_plain(value):
+    """
+    Convert a nested cell into plain Python lists and dicts.
+
+    Parquet reads list/struct columns back as NumPy arrays of dicts holding
+    NumPy scalars, which `json.dumps` cannot encode.
+
+    Parameters:
+    - value (mixed): The cell value.
+
+    Returns:
+    mixed: The value with arrays turned into lists and NumPy/Arrow scalars into Python values.
+    """
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if _is_nested(value):
+        return [to_plain(item) for item in value]
+    if isinstance(value, pa.Scalar):
+        return value.as_py()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def encode_cell(value):
+    """
+    Encode a cell as text: lists, dicts and arrays become JSON, other values `str()`.
+    Missing values are kept.
+
+    Parameters:
+    - value (mixed): The cell value.
+
+    Returns:
+    str or mixed: The encoded value.
+    """
+    if _is_nested(value) or isinstance(value, pa.Scalar):
+        return json.dumps(to_plain(value), default=str)
+    if pd.isna(value):
+        return value
+    return str(value)
+
+
+def _has_empty_struct(arrow_type):
+    """
+    Return True if the type contains a struct without fields, which Parquet cannot store.
+    """
+    if pa.types.is_struct(arrow_type):
+        return arrow_type.num_fields == 0 or any(
+            _has_empty_struct(arrow_type.field(index).type)
+            for index in range(arrow_type.num_fields))
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        return _has_empty_struct(arrow_type.value_type)
+    return False
+
+
+def _coerce_mixed_object_columns(data_frame):
+    """
+    Prepare object columns for Arrow.
+
+    Nested lists and dicts are kept as Arrow list/struct columns. Columns that
+    Arrow cannot type (e.g. mixed ints and strings, or records whose fields
+    change type) are encoded with `encode_cell`.
+    """
+    data_frame = data_frame.copy()
+    for column in data_frame.columns[data_frame.dtypes == object]:
+        try:
+            array = pa.array(data_frame[column], from_pandas=True)
+            if _has_empty_struct(array.type):
+                raise pa.ArrowInvalid(f"Column {column} has an empty struct.")
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            data_frame[column] = data_frame[column].map(encode_cell)
+    return data_frame
+
+
+def write_frame(data_frame, target, file_format=DEFAULT_FILE_FORMAT,
+                compression=PARQUET_COMPRESSION):
+    """
+    Write a DataFrame in the given format.
+
+    Nested values (e.g. a property's taxHistory) are stored as Arrow list/struct
+    columns in Parquet and as JSON text in CSV.
+
+    Parameters:
+    - data_frame (DataFrame): The data to write.
+    - target (str or file): A path or a binary file object.
+    - file_format (str, optional): 'csv' or 'parquet'. Defaults to the FILE_FORMAT variable.
+    - compression (str, optional): The Parquet compression codec.
+
+    Returns:
+    None
+    """
+    if file_format == 'parquet':
+        _coerce_mixed_object_columns(data_frame).to_parquet(
+            target, engine='pyarrow', compression=compression, index=False)
+    elif file_format == 'csv':
+        data_frame = data_frame.copy()
+        for column in data_frame.columns[data_frame.dtypes == object]:
+            if data_frame[column].map(_is_nested).any():
+                data_frame[column] = data_frame[column].map(encode_cell)
+        data_frame.to_csv(target, index=False)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def read_frame(source, file_format, usecols=None, dtype=None, chunksize=None):
+    """
+    Read a DataFrame stored in the given format.
+
+    Parameters:
+    - source (str or file): A path or a binary file object.
+    - file_format (str): 'csv' or 'parquet'.
+    - usecols (list, optional): Only read these columns.
+    - dtype (dict, optional): Column dtypes. Parquet files keep their stored types and
+      are only cast for the listed columns.
+    - chunksize (int, optional): Return an iterator of DataFrames with this many rows each.
+
+    Returns:
+    DataFrame or iterator: The data.
+    """
+    if file_format == 'csv':
+        return pd.read_csv(source, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    if file_format != 'parquet':
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+    if chunksize is not None:
+        return _iter_parquet_batches(source, usecols, dtype, chunksize)
+
+    data_frame = pq.read_table(source, columns=usecols).to_pandas()
+    return data_frame.astype(dtype) if dtype else data_frame
+
+
+def _iter_parquet_batches(source, usecols, dtype, chunksize):
+    """
+    Yield DataFrames of at most `chunksize` rows from a Parquet file.
+    """
+    parquet_file = pq.ParquetFile(source)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=usecols):
+        data_frame = batch.to_pandas()
+        yield data_frame.astype(dtype) if dtype else data_frame
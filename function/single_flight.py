@@ -0,0 +1,65 @@
+"""
+This module provides single-flight request coalescing.
+
+When several Streamlit sessions start the same work at the same time, only the
+first caller runs it; the others wait on its future and receive the same
+result (or exception).
+"""
+from library.libraries import threading, Future
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share a key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executed': 0, 'shared': 0}
+
+    def do(self, key, function):
+        """
+        Run `function` unless a call with the same key is already in flight.
+
+        Parameters:
+        - key (hashable): Identifies identical work.
+        - function (callable): The work to run. Takes no arguments.
+
+        Returns:
+        object: The result of the call that ran, shared by all concurrent callers.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._stats['executed'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as error_message:
+            future.set_exception(error_message)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        """
+        Return a snapshot of the counters.
+
+        Returns:
+        dict: Calls executed, calls that shared an in-flight result and calls in flight.
+        """
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
@@ -0,0 +1,276 @@
+"""
+This module stores listing searches as incremental snapshots.
+
+A snapshot is either a full listing file or a delta against the previous
+snapshot of the same region. A delta keys rows by zpid and only holds inserted
+listings, listings whose price, priceChange or homeStatus changed, and
+delisted zpids. Any snapshot is materialized by loading the full snapshot at
+the start of its chain and applying the deltas in order.
+
+Each delta object records its base in its GCS metadata, so a chain can be
+followed without the MongoDB metadata of its snapshots.
+"""
+from library.libraries import os, json, urllib, pd
+from function.functions import BUCKET_NAME, SNAPSHOT_KINDS, download_file_from_gcs, get_gcs_bucket
+from function.mongo_manager import get_mongo_manager
+from function.partitions import (
+    PARTITION_KEYS, list_partitions, parse_partition, partition_prefix, read_manifest
+)
+
+TRACKED_COLUMNS = ('price', 'priceChange', 'homeStatus')
+CHANGE_COLUMN = 'change'
+# A full snapshot is stored again after this many consecutive deltas,
+# which bounds the number of files read to materialize a snapshot.
+FULL_SNAPSHOT_EVERY = int(os.environ.get('SNAPSHOT_FULL_EVERY', 7))
+
+
+def region_from_url(listing_url):
+    """
+    Return the region fields of a Zillow search URL.
+
+    Parameters:
+    - listing_url (str): The Zillow search URL.
+
+    Returns:
+    dict: 'regionId', 'city' and 'state'. Missing values are None.
+    """
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(listing_url).query)
+    search_query_state = json.loads(query['searchQueryState'][0])
+
+    regions = search_query_state.get('regionSelection') or [{}]
+    search_term = search_query_state.get('usersSearchTerm', '').rsplit(' ', 1)
+    return {
+        'regionId': regions[0].get('regionId'),
+        'city': search_term[0].title() or None,
+        'state': search_term[1] if len(search_term) > 1 else None,
+    }
+
+
+def is_delta(filename):
+    """Return True if the file name belongs to a delta snapshot."""
+    return os.path.splitext(filename)[0].endswith(SNAPSHOT_KINDS['delta'])
+
+
+def _changed(previous, current):
+    """Return a mask of values that differ, treating two missing values as equal."""
+    if pd.api.types.is_numeric_dtype(previous) or pd.api.types.is_numeric_dtype(current):
+        previous = pd.to_numeric(previous, errors='coerce')
+        current = pd.to_numeric(current, errors='coerce')
+    both_missing = previous.isna() & current.isna()
+    return (previous != current).fillna(True) & ~both_missing
+
+
+def compute_delta(previous, current):
+    """
+    Compute the changes between two listing snapshots.
+
+    Parameters:
+    - previous (DataFrame): The earlier snapshot.
+    - current (DataFrame): The new snapshot.
+
+    Returns:
+    DataFrame: The inserted and updated rows of `current` and the zpids of delisted rows,
+    with a `change` column set to 'insert', 'update' or 'delete'.
+    """
+    # Parquet keeps zpid as an integer while CSV and API rows may hold strings.
+    previous = previous.assign(zpid=previous['zpid'].astype(str))
+    current = current.assign(zpid=current['zpid'].astype(str))
+    previous = previous.drop_duplicates('zpid').set_index('zpid', drop=False)
+    current = current.drop_duplicates('zpid').set_index('zpid', drop=False)
+
+    inserted = ~current.index.isin(previous.index)
+    common = current.index[~inserted]
+    updated = pd.Series(False, index=common)
+    for column in TRACKED_COLUMNS:
+        if column in current.columns and column in previous.columns:
+            updated |= _changed(previous.loc[common, column], current.loc[common, column])
+        elif column in current.columns or column in previous.columns:
+            updated |= True
+
+    upserts = pd.concat([
+        current[inserted].assign(**{CHANGE_COLUMN: 'insert'}),
+        current.loc[updated[updated].index].assign(**{CHANGE_COLUMN: 'update'}),
+    ])
+    deletes = pd.DataFrame({
+        'zpid': previous.index[~previous.index.isin(current.index)],
+        CHANGE_COLUMN: 'delete',
+    })
+    return pd.concat([upserts, deletes], ignore_index=True)
+
+
+def apply_delta(base, delta):
+    """
+    Apply a delta from `compute_delta` to a snapshot.
+
+    Parameters:
+    - base (DataFrame): The snapshot the delta was computed against.
+    - delta (DataFrame): The delta.
+
+    Returns:
+    DataFrame: The next snapshot.
+    """
+    base_zpids = base['zpid'].astype(str)
+    delta_zpids = delta['zpid'].astype(str)
+    kept = base[~base_zpids.isin(delta_zpids)]
+    upserts = delta[delta[CHANGE_COLUMN] != 'delete'].drop(columns=CHANGE_COLUMN)
+
+    result = pd.concat([kept, upserts], ignore_index=True)
+    # Delete rows are null outside zpid, which widens some column types in the delta file.
+    for column, dtype in base.dtypes.items():
+        if column in result.columns and result[column].dtype != dtype:
+            try:
+                result[column] = result[column].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return result
+
+
+def get_snapshot_metadata(filename):
+    """
+    Return the metadata document of a listing snapshot.
+
+    Parameters:
+    - filename (str): The name of the snapshot file.
+
+    Returns:
+    dict or None: The metadata document, or None if there is none.
+    """
+    manager = get_mongo_manager()
+    collection = manager.get_collection(os.environ.get('LISTING_COLLECTION'))
+    with manager.track('listings.find_one'):
+        return collection.find_one({'file': filename})
+
+
+def latest_snapshot(region, storage_client=None):
+    """
+    Return the metadata of the newest listing snapshot of a region.
+
+    The snapshot is looked up in MongoDB first. Regions without metadata there,
+    e.g. because it was written with an expiry, are looked up in the manifests
+    of their partitions.
+
+    Parameters:
+    - region (dict): 'regionId', 'state' and 'city', as from `region_from_url`.
+    - storage_client (storage.Client, optional): The Google Cloud Storage client.
+      Without it only MongoDB is searched.
+
+    Returns:
+    dict or None: 'file', 'prefix' and 'chainLength' of the snapshot, or None if the
+    region has no snapshot.
+    """
+    collection_name = os.environ.get('LISTING_COLLECTION')
+    manager = get_mongo_manager()
+    manager.ensure_index(collection_name, 'regionId')
+    collection = manager.get_collection(collection_name)
+    with manager.track('listings.find_one'):
+        document = collection.find_one({'regionId': region['regionId']},
+                                       sort=[('createAt', -1)])
+    if document is not None or storage_client is None:
+        return document
+    if not region.get('state') or not region.get('city'):
+        return None
+    return _latest_in_manifests(storage_client, region['state'], region['city'])
+
+
+def _latest_in_manifests(storage_client, state, city):
+    """Return the newest manifest entry of a city as snapshot metadata, or None."""
+    for prefix in reversed(list_partitions(storage_client, state, city)):
+        manifest = read_manifest(storage_client, prefix)
+        if not manifest or not manifest['files']:
+            continue
+        # File names start with the date and a time-ordered ObjectId.
+        entry = max(manifest['files'], key=lambda item: item['file'])
+        kind = entry.get('kind', 'full')
+        # Entries written before chainLength was recorded start a new chain.
+        default_length = 0 if kind == 'full' else FULL_SNAPSHOT_EVERY
+        return {'file': entry['file'], 'prefix': prefix, 'kind': kind,
+                'chainLength': entry.get('chainLength', default_length)}
+    return None
+
+
+def base_reference(base, base_prefix):
+    """
+    Return the GCS object metadata that links a delta to its base snapshot.
+
+    Parameters:
+    - base (str): The name of the base snapshot file.
+    - base_prefix (str): The folder prefix of the base snapshot.
+
+    Returns:
+    dict: The object metadata to store with the delta.
+    """
+    return {'base': base, 'basePrefix': base_prefix}
+
+
+def _resolve_base(filename, prefix, storage_client):
+    """
+    Return the base file of a delta and the prefixes it may be stored under.
+
+    The base is read from the delta object's metadata. Deltas stored before the
+    reference was kept there fall back to their Mongo metadata document.
+    """
+    blob = get_gcs_bucket(storage_client, BUCKET_NAME).get_blob(f"{prefix}/{filename}")
+    reference = (blob.metadata or {}) if blob is not None else {}
+    if reference.get('base'):
+        base = reference['base']
+        prefixes = [reference.get('basePrefix', prefix)]
+    else:
+        metadata = get_snapshot_metadata(filename)
+        if metadata is None or not metadata.get('base'):
+            return None, []
+        base = metadata['base']
+        prefixes = [(get_snapshot_metadata(base) or {}).get('prefix', prefix)]
+
+    # A migrated delta keeps the reference to its flat base, which is moved
+    # into the partition of its own date.
+    partition = parse_partition(prefix)
+    if len(partition) == len(PARTITION_KEYS):
+        prefixes.append(partition_prefix(partition['state'], partition['city'], base[:10]))
+    return base, list(dict.fromkeys(prefixes))
+
+
+def _download_first(filename, prefixes, storage_client):
+    """Download a snapshot from the first prefix that holds it. Returns (DataFrame, prefix)."""
+    for prefix in prefixes:
+        data_frame = download_file_from_gcs(filename, storage_client, prefix)
+        if data_frame is not None:
+            return data_frame, prefix
+    print(f"Snapshot {filename} is missing.")
+    return None, None
+
+
+def materialize_snapshot(filename, storage_client, prefix='listings'):
+    """
+    Load a listing snapshot, applying its chain of deltas if it is incremental.
+
+    The file is read from the partition prefix recorded in its metadata, or from
+    `prefix` if none is recorded. Each delta names its base in its object metadata.
+
+    Parameters:
+    - filename (str): The name of a full or delta snapshot file.
+    - storage_client (storage.Client): The Google Cloud Storage client.
+    - prefix (str, optional): The folder prefix of files stored without a partition.
+
+    Returns:
+    DataFrame or None: The complete listings, or None if a file of the chain is missing.
+    """
+    metadata = get_snapshot_metadata(filename)
+    prefixes = [(metadata or {}).get('prefix', prefix)]
+    chain = []
+    while is_delta(filename):
+        delta, delta_prefix = _download_first(filename, prefixes, storage_client)
+        if delta is None:
+            return None
+        chain.append(delta)
+        delta_file = filename
+        filename, prefixes = _resolve_base(delta_file, delta_prefix, storage_client)
+        if filename is None:
+            print(f"The base of snapshot {delta_file} is unknown.")
+            return None
+
+    data_frame, _ = _download_first(filename, prefixes, storage_client)
+    if data_frame is None:
+        return None
+    for delta in reversed(chain):
+        data_frame = apply_delta(data_frame, delta)
+    return data_frame
@@ -1,31 +1,110 @@
-# Data processing libraries
-import pandas as pd
-import numpy as np
-
-# Visualization libraries
-import pydeck as pdk
-import plotly.express as px
-import altair as alt
-import seaborn as sns
-import matplotlib.pyplot as plt
-
 # Utility libraries
 import time
 import os
+import sys
+import types
+import argparse
+import importlib
 import io
 import re
 import json
 import base64
 import urllib.parse
-
-# External libraries
+import threading
+import itertools
+import asyncio
+import random
+import hashlib
+import tempfile
+import sqlite3
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from google.cloud import storage
 from urllib.error import URLError
 
+__all__ = [
+    'time', 'os', 'sys', 'types', 'argparse', 'importlib', 'io', 're', 'json', 'base64',
+    'urllib', 'threading', 'itertools', 'asyncio', 'random', 'hashlib', 'tempfile',
+    'sqlite3', 'subprocess', 'OrderedDict', 'Future', 'ThreadPoolExecutor', 'as_completed',
+    'contextmanager', 'dataclass', 'field', 'datetime', 'timedelta', 'URLError',
+    'LAZY_IMPORTS', 'LazyModule', 'lazy_import',
+    'pd', 'np', 'pa', 'pq', 'duckdb', 'pdk', 'px', 'alt', 'sns', 'plt',
+    'pymongo', 'bson', 'storage', 'gcs_exceptions', 'st', 'requests', 'urllib3', 'httpx',
+]
+
+# Set LAZY_IMPORTS=0 to import every module below when this file is imported.
+LAZY_IMPORTS = os.environ.get('LAZY_IMPORTS', '1') != '0'
+
+
+class LazyModule(types.ModuleType):
+    """
+    A module that is only imported on first attribute access.
+
+    `from library.libraries import pd` binds this placeholder, so importing a
+    page or a batch job does not import pandas until `pd.<name>` is used. The
+    module's namespace is then copied in, and later lookups are plain attribute
+    lookups.
+    """
+
+    def _load(self):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}'>"
+
+
+def lazy_import(name):
+    """
+    Return a module that is imported on first use.
+
+    Parameters:
+    - name (str): The full module name, e.g. 'plotly.express'.
+
+    Returns:
+    module: A LazyModule, or the imported module if LAZY_IMPORTS is off.
+    """
+    if not LAZY_IMPORTS:
+        return importlib.import_module(name)
+    return LazyModule(name)
+
+
+# Data processing libraries
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+pa = lazy_import('pyarrow')
+pq = lazy_import('pyarrow.parquet')
+duckdb = lazy_import('duckdb')
+
+# Visualization libraries
+pdk = lazy_import('pydeck')
+px = lazy_import('plotly.express')
+alt = lazy_import('altair')
+sns = lazy_import('seaborn')
+plt = lazy_import('matplotlib.pyplot')
+
+# Database and storage
+# Exception classes are reached through their module, e.g. `pymongo.errors.PyMongoError`;
+# an `except` clause only evaluates it when an exception is raised.
+pymongo = lazy_import('pymongo')
+bson = lazy_import('bson')
+storage = lazy_import('google.cloud.storage')
+gcs_exceptions = lazy_import('google.api_core.exceptions')
+
 # Web application framework
-import streamlit as st
+st = lazy_import('streamlit')
 
 # Network and API
-import requests
+requests = lazy_import('requests')
+urllib3 = lazy_import('urllib3')
+httpx = lazy_import('httpx')
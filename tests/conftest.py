@@ -0,0 +1,134 @@
+"""
+Shared fixtures: an in-memory MongoDB (mongomock) and an in-memory GCS bucket.
+
+The fake bucket implements the parts of the `google.cloud.storage` API the
+app uses, including generation preconditions, so the storage code runs
+unchanged against it.
+"""
+import io
+
+import mongomock
+import pytest
+from google.api_core.exceptions import NotFound, NotModified, PreconditionFailed
+
+from function import file_cache
+from function.mongo_manager import MongoConnectionManager, set_mongo_manager
+
+
+class FakeBlob:
+    """An object handle. Like `storage.Blob`, it is pinned to a generation once read."""
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+        self.metadata = None
+        self.chunk_size = None
+        self.time_created = None
+
+    def _stored(self):
+        stored = self.bucket.objects.get(self.name)
+        if stored is None or (self.generation is not None
+                              and stored['generation'] != self.generation):
+            raise NotFound(self.name)
+        return stored
+
+    def download_as_bytes(self):
+        stored = self._stored()
+        self.generation = stored['generation']
+        return stored['data']
+
+    def download_to_file(self, file, if_generation_not_match=None):
+        stored = self._stored()
+        if stored['generation'] == if_generation_not_match:
+            raise NotModified(self.name)
+        self.generation = stored['generation']
+        file.write(stored['data'])
+
+    def open(self, mode='rb', **_):
+        return io.BytesIO(self.download_as_bytes())
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        self.bucket.store(self.name, data.encode() if isinstance(data, str) else data,
+                          self.metadata, if_generation_match)
+
+    def upload_from_file(self, file, size=None, content_type=None):
+        self.bucket.store(self.name, file.read(size), self.metadata)
+
+    def patch(self):
+        self.bucket.objects[self.name]['metadata'] = self.metadata
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    """A bucket holding objects in memory."""
+
+    def __init__(self, name):
+        self.name = name
+        self.objects = {}
+        # Callables run one per write, before it, e.g. to simulate a concurrent writer.
+        self.before_write = []
+
+    def store(self, name, data, metadata=None, if_generation_match=None):
+        if self.before_write:
+            self.before_write.pop(0)()
+        current = self.objects.get(name, {}).get('generation', 0)
+        if if_generation_match is not None and current != if_generation_match:
+            raise PreconditionFailed(name)
+        self.objects[name] = {'data': data, 'generation': current + 1, 'metadata': metadata}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        if name not in self.objects:
+            return None
+        blob = FakeBlob(self, name)
+        blob.metadata = self.objects[name]['metadata']
+        return blob
+
+    def copy_blob(self, blob, destination_bucket, new_name):
+        stored = self.objects[blob.name]
+        destination_bucket.store(new_name, stored['data'], stored['metadata'])
+
+    def list_blobs(self, prefix='', delimiter=None):
+        names = sorted(name for name in self.objects if name.startswith(prefix))
+        nested = [name for name in names if delimiter and delimiter in name[len(prefix):]]
+        iterator = type('Iterator', (), {})()
+        iterator.pages = [[self.get_blob(name) for name in names if name not in nested]]
+        iterator.prefixes = {
+            prefix + name[len(prefix):].split(delimiter)[0] + delimiter for name in nested
+        }
+        return iterator
+
+
+class FakeStorageClient:
+    """A storage client with a single in-memory bucket."""
+
+    def __init__(self):
+        self.bucket_handle = FakeBucket('test-bucket')
+
+    def get_bucket(self, bucket_name):
+        return self.bucket_handle
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Use an in-memory MongoDB for the test."""
+    monkeypatch.setenv('DB_NAME', 'zillow_test')
+    monkeypatch.setenv('LISTING_COLLECTION', 'listings')
+    monkeypatch.setenv('PROPERTY_COLLECTION', 'properties')
+    manager = MongoConnectionManager(client_factory=mongomock.MongoClient)
+    previous = set_mongo_manager(manager)
+    yield manager
+    set_mongo_manager(previous)
+
+
+@pytest.fixture
+def storage_client(monkeypatch, tmp_path):
+    """Use an in-memory bucket and an empty file cache for the test."""
+    monkeypatch.setattr(file_cache, '_CACHE',
+                        file_cache.LocalFileCache(directory=str(tmp_path / 'cache')))
+    return FakeStorageClient()
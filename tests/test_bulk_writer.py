@@ -0,0 +1,53 @@
+"""Tests for the buffered metadata writer."""
+import pytest
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from function.bulk_writer import MetadataBulkWriter
+from function.functions import properties_save_to_db
+
+
+def test_property_ids_are_read_back(mongo):
+    existing_id, existing_file = properties_save_to_db({}, '1001')
+    writer = MetadataBulkWriter(manager=mongo)
+
+    writer.add_property({}, '1001')
+    new_file = writer.add_property({}, '1002')
+    written = dict((filename, object_id) for object_id, filename in writer.close())
+
+    assert written[existing_file] == existing_id
+    assert written[new_file] == mongo.get_collection('properties').find_one(
+        {'file': new_file})['_id']
+
+
+def test_listing_ids_match_the_stored_documents(mongo):
+    writer = MetadataBulkWriter(max_batch_size=2, manager=mongo)
+    added = [writer.add_listing({'regionId': index}) for index in range(3)]
+
+    assert writer.close() == added
+    assert mongo.get_collection('listings').count_documents({}) == 3
+
+
+def test_failed_listings_stay_buffered(mongo, monkeypatch):
+    collection = mongo.get_collection('listings')
+    bulk_write = collection.bulk_write
+    attempts = []
+
+    def fail_second_document(operations, ordered=True):
+        attempts.append(len(operations))
+        if len(attempts) == 1:
+            bulk_write(operations[:1], ordered=ordered)
+            raise BulkWriteError({'writeErrors': [{'index': 1, 'code': 1, 'errmsg': 'failed'}]})
+        return bulk_write(operations, ordered=ordered)
+
+    monkeypatch.setattr(type(mongo), 'get_collection',
+                        lambda manager, name: collection)
+    monkeypatch.setattr(collection, 'bulk_write', fail_second_document, raising=False)
+    writer = MetadataBulkWriter(manager=mongo)
+    first = writer.add_listing({})
+    second = writer.add_listing({})
+
+    with pytest.raises(PyMongoError):
+        writer.flush()
+    assert writer.close() == [first, second]
+    assert attempts == [2, 1]
+    assert collection.count_documents({}) == 2
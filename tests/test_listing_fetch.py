@@ -0,0 +1,48 @@
+"""Tests for fetching every listing of a search."""
+from function import listing_fetch, pipelines
+from function.functions import generate_zillow_url
+
+
+def _fake_listings(total_for_url, cap=5):
+    """Return a `_unpack`-style fetch serving at most `cap` rows per area."""
+    def fetch(url):
+        total = total_for_url(url)
+        return [{'zpid': f"{url}#{index}"} for index in range(min(total, cap))], total
+    return fetch
+
+
+def _run_plan(listing_url, max_depth, fetch):
+    plan = listing_fetch._split_plan(listing_url, max_depth)  # pylint: disable=protected-access
+    try:
+        urls = next(plan)
+        while True:
+            urls = plan.send([fetch(url) for url in urls])
+    except StopIteration as done:
+        return done.value
+
+
+def test_areas_truncated_at_the_depth_limit_are_counted():
+    url = generate_zillow_url('Los Angeles', 'CA', 34.0, -118.0, 12447)
+
+    records, total, requests_made, truncated = _run_plan(
+        url, 1, _fake_listings(lambda sub_url: 40 if sub_url == url else 10))
+
+    assert (len(records), total, requests_made, truncated) == (25, 40, 5, 4)
+
+    _, _, _, truncated = _run_plan(url, 0, _fake_listings(lambda _: 40))
+    assert truncated == 1
+
+
+def test_stored_and_total_counts_are_saved(mongo, storage_client, monkeypatch):
+    url = generate_zillow_url('Los Angeles', 'CA', 34.0, -118.0, 12447)
+    monkeypatch.setattr(pipelines, 'fetch_all_listings',
+                        lambda _: ([{'zpid': 1, 'price': 100}], 40, 5, 4))
+
+    object_id, filename, total, stored = pipelines.search_and_store_listings(
+        url, storage_client)
+
+    assert (total, stored) == (40, 1)
+    document = mongo.get_collection('listings').find_one({'file': filename})
+    assert document['_id'] == object_id
+    assert (document['totalResultCount'], document['storedListings'],
+            document['requests'], document['truncatedAreas']) == (40, 1, 5, 4)
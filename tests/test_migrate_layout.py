@@ -0,0 +1,47 @@
+"""Tests for the move of flat listing files into partitions."""
+from benchmarks.bench_listing_transform import make_records
+from function import migrate_layout
+from function.functions import listings_save_to_db, upload_frame_to_gcs
+from function.listing_transform import transform_listings
+from function.partitions import read_manifest
+
+PARTITION = 'listings/state=CA/city=Los%20Angeles/date=2024-01-31'
+
+
+def _store_flat(storage_client, filename, rows=20):
+    data_frame = transform_listings(make_records(rows)).assign(state='CA', city='Los Angeles')
+    upload_frame_to_gcs(data_frame, filename, storage_client, prefix='listings')
+
+
+def test_files_without_metadata_are_moved(mongo, storage_client):
+    _store_flat(storage_client, '2024-01-31-legacy.csv')
+    _, tracked = listings_save_to_db({})
+    _store_flat(storage_client, tracked)
+    tracked_partition = PARTITION.replace('2024-01-31', tracked[:10])
+
+    summary = migrate_layout.run(storage_client, delete_source=True)
+
+    assert summary['moved'] == 2
+    objects = storage_client.bucket_handle.objects
+    assert f"{PARTITION}/2024-01-31-legacy.csv" in objects
+    assert not any(name.count('/') == 1 for name in objects)
+    assert [entry['file'] for entry in read_manifest(storage_client, PARTITION)['files']] == [
+        '2024-01-31-legacy.csv']
+    document = mongo.get_collection('listings').find_one({'file': tracked})
+    assert document['prefix'] == tracked_partition
+
+
+def test_rerun_does_not_download_handled_files(mongo, storage_client, monkeypatch):
+    _store_flat(storage_client, '2024-01-31-moved.csv')
+    storage_client.bucket_handle.store('listings/notes.csv', b'a,b\n1,2\n')
+    listings_save_to_db({})
+
+    first = migrate_layout.run(storage_client)
+    downloads = []
+    monkeypatch.setattr(migrate_layout, 'download_file_from_gcs',
+                        lambda *args, **kwargs: downloads.append(args))
+    second = migrate_layout.run(storage_client)
+
+    assert (first['moved'], first['skipped'], first['missing']) == (1, 1, 1)
+    assert (second['moved'], second['skipped'], second['missing']) == (0, 2, 0)
+    assert not downloads
@@ -0,0 +1,13 @@
+"""Tests for the shared MongoDB connection manager."""
+
+
+def test_rejected_unique_index_is_not_retried(mongo, capsys):
+    collection = mongo.get_collection('listings')
+    collection.insert_many([{'file': 'a.parquet'}, {'file': 'a.parquet'}])
+
+    assert not mongo.ensure_index('listings', 'file', unique=True)
+    assert not mongo.ensure_index('listings', 'file', unique=True)
+
+    assert mongo.metrics()['create_index']['count'] == 1
+    assert capsys.readouterr().out.count('Could not create index') == 1
+    assert ('listings', 'file', True) in mongo.index_errors()
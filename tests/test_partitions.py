@@ -0,0 +1,57 @@
+"""Tests for the partition manifests."""
+import json
+
+import pandas as pd
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+
+from function.partitions import (
+    MANIFEST_NAME, MANIFEST_RETRIES, manifest_entry, partition_prefix, prune_files,
+    update_manifest
+)
+
+PREFIX = partition_prefix('CA', 'Los Angeles', '2024-01-31')
+
+
+def _entry(filename, prices, kind='full'):
+    return manifest_entry(filename, pd.DataFrame({'price': prices}), kind)
+
+
+def _stored_manifest(storage_client):
+    blob = storage_client.bucket_handle.objects[f"{PREFIX}/{MANIFEST_NAME}"]
+    return json.loads(blob['data'])
+
+
+def test_update_manifest_retries_after_a_concurrent_write(storage_client):
+    update_manifest(storage_client, PREFIX, _entry('a.parquet', [100]))
+    # Another writer updates the manifest between this writer's read and write.
+    storage_client.bucket_handle.before_write.append(
+        lambda: update_manifest(storage_client, PREFIX, _entry('b.parquet', [200])))
+
+    update_manifest(storage_client, PREFIX, _entry('c.parquet', [300]))
+
+    manifest = _stored_manifest(storage_client)
+    assert [entry['file'] for entry in manifest['files']] == ['a.parquet', 'b.parquet',
+                                                               'c.parquet']
+    assert manifest['rows'] == 3
+
+
+def test_update_manifest_gives_up_after_retries(storage_client):
+    bucket = storage_client.bucket_handle
+    update_manifest(storage_client, PREFIX, _entry('a.parquet', [100]))
+
+    def conflict():
+        bucket.objects[f"{PREFIX}/{MANIFEST_NAME}"]['generation'] += 1
+
+    bucket.before_write.extend([conflict] * MANIFEST_RETRIES)
+    with pytest.raises(PreconditionFailed):
+        update_manifest(storage_client, PREFIX, _entry('b.parquet', [200]))
+
+
+def test_prune_files_keeps_deltas(storage_client):
+    update_manifest(storage_client, PREFIX, _entry('full.parquet', [100, 200]))
+    update_manifest(storage_client, PREFIX, _entry('delta.delta.parquet', [150], 'delta'))
+
+    matches = prune_files(storage_client, state='CA', ranges={'price': (1000, None)})
+
+    assert [entry['file'] for _, entry in matches] == ['delta.delta.parquet']
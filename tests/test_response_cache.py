@@ -0,0 +1,13 @@
+"""Tests for the scraper response cache keys."""
+import pytest
+
+from function.functions import get_listings
+from function.pipelines import search_and_store_listings
+from function.response_cache import listing_cache_key
+
+
+def test_missing_listing_url_is_rejected():
+    with pytest.raises(ValueError):
+        listing_cache_key(None)
+    assert not get_listings(None).is_success
+    assert search_and_store_listings(None, storage_client=None) is None
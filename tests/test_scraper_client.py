@@ -0,0 +1,85 @@
+"""Tests for the scraper API client against a local stub HTTP server."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from function.scraper_client import ScraperClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer each GET with the next queued (status, body, delay) response."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.server.paths.append(self.path)
+        status, body, delay = self.server.responses.pop(0)
+        time.sleep(delay)
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.responses = []
+    server.paths = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **options):
+    host, port = server.server_address
+    return ScraperClient(api_key='test-key', base_url=f"http://{host}:{port}/zillow",
+                         backoff_factor=0, **options)
+
+
+def test_rate_limits_and_server_errors_are_retried(stub_server):
+    payload = {'is_success': True, 'data': {'categoryTotals': {'cat1': {'totalResultCount': 3}}}}
+    stub_server.responses = [(429, {'message': 'slow down'}, 0),
+                             (503, {'message': 'unavailable'}, 0),
+                             (200, payload, 0)]
+
+    result = _client(stub_server).get_listings('https://www.zillow.com/homes/')
+
+    assert result.is_success
+    assert result.status_code == 200
+    assert result.data == payload['data']
+    assert result.json() is result.payload
+    assert len(stub_server.paths) == 3
+    assert all(path.startswith('/zillow/listing?api_key=test-key') for path in stub_server.paths)
+
+
+def test_failures_are_reported_as_unsuccessful(stub_server):
+    stub_server.responses = [(200, {'is_success': False, 'message': 'bad zpid'}, 0),
+                             (500, {'message': 'error'}, 0)]
+    client = _client(stub_server, max_retries=0)
+
+    rejected = client.get_properties(zpid='1')
+    failed = client.get_properties(zpid='1')
+
+    assert (rejected.is_success, rejected.message) == (False, 'bad zpid')
+    assert (failed.is_success, failed.status_code) == (False, 500)
+
+
+def test_timeouts_are_reported_as_unsuccessful(stub_server):
+    stub_server.responses = [(200, {'is_success': True}, 1.0)]
+    client = _client(stub_server, max_retries=0, timeouts={'property': (1, 0.2)})
+
+    result = client.get_properties(zpid='1')
+
+    assert not result.is_success
+    assert result.message
@@ -0,0 +1,33 @@
+"""Tests for the CSV and Parquet file formats."""
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from function.serialization import encode_cell, read_frame, write_frame
+
+
+def test_csv_encodes_nested_cells_read_back_from_parquet():
+    tax_history = [{'time': 1700000000000, 'taxPaid': 1234.5}]
+    data_frame = pd.DataFrame({'zpid': [1, 2], 'taxHistory': [tax_history, []]})
+
+    parquet = io.BytesIO()
+    write_frame(data_frame, parquet, 'parquet')
+    parquet.seek(0)
+    restored = read_frame(parquet, 'parquet')
+    assert isinstance(restored['taxHistory'][0], np.ndarray)
+
+    csv = io.StringIO()
+    write_frame(restored, csv, 'csv')
+    csv.seek(0)
+    stored = pd.read_csv(csv)
+    assert json.loads(stored['taxHistory'][0]) == tax_history
+    assert json.loads(stored['taxHistory'][1]) == []
+
+
+def test_encode_cell_keeps_missing_values():
+    assert encode_cell(None) is None
+    assert np.isnan(encode_cell(float('nan')))
+    assert encode_cell(np.int64(3)) == '3'
+    assert encode_cell({'a': np.float64(1.5)}) == '{"a": 1.5}'
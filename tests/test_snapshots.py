@@ -0,0 +1,71 @@
+"""Tests for incremental listing snapshots."""
+import pandas as pd
+
+from benchmarks.bench_listing_transform import make_records
+from function import pipelines
+from function.functions import generate_zillow_url
+from function.listing_transform import transform_listings
+from function.snapshots import apply_delta, compute_delta, materialize_snapshot
+
+
+def _sorted(data_frame):
+    data_frame = data_frame.assign(zpid=data_frame['zpid'].astype(str))
+    return data_frame.sort_values('zpid').reset_index(drop=True)
+
+
+def test_delta_round_trip():
+    previous = pd.DataFrame({'zpid': [1, 2, 3], 'price': [100.0, 200.0, 300.0],
+                             'homeStatus': ['FOR_SALE'] * 3})
+    current = pd.DataFrame({'zpid': [2, 3, 4], 'price': [200.0, 250.0, 400.0],
+                            'homeStatus': ['FOR_SALE'] * 3})
+
+    delta = compute_delta(previous, current)
+
+    assert dict(zip(delta['zpid'], delta['change'])) == {
+        '4': 'insert', '3': 'update', '1': 'delete'}
+    pd.testing.assert_frame_equal(_sorted(apply_delta(previous, delta)), _sorted(current))
+
+
+def test_delta_matches_zpids_stored_with_another_type():
+    previous = pd.DataFrame({'zpid': [1, 2], 'price': [100.0, 200.0]})
+    current = pd.DataFrame({'zpid': ['1', '2'], 'price': [100.0, 200.0]})
+
+    assert compute_delta(previous, current).empty
+
+
+def test_chain_is_readable_after_metadata_expired(mongo, storage_client, monkeypatch):
+    runs = iter([make_records(200), make_records(220)[10:], make_records(230)[20:]])
+    latest = {}
+
+    def fetch(_):
+        records = next(runs)
+        latest['frame'] = transform_listings(records)
+        return records, len(records), 1, 0
+
+    monkeypatch.setattr(pipelines, 'fetch_all_listings', fetch)
+    url = generate_zillow_url('Los Angeles', 'CA', 34.0, -118.0, 12447)
+    for _ in range(3):
+        _, filename, _, _ = pipelines.search_and_store_listings(url, storage_client,
+                                                                incremental=True)
+    assert filename.endswith('.delta.parquet')
+
+    collection = mongo.get_collection('listings')
+    prefix = collection.find_one({'file': filename})['prefix']
+    collection.delete_many({})
+
+    snapshot = materialize_snapshot(filename, storage_client, prefix)
+    assert sorted(snapshot['zpid'].astype(str)) == sorted(latest['frame']['zpid'].astype(str))
+
+
+def test_previous_snapshot_is_found_without_metadata(mongo, storage_client, monkeypatch):
+    runs = iter([make_records(200), make_records(210)])
+    monkeypatch.setattr(pipelines, 'fetch_all_listings',
+                        lambda _: (next(runs), 200, 1, 0))
+    url = generate_zillow_url('Los Angeles', 'CA', 34.0, -118.0, 12447)
+
+    _, first, _, _ = pipelines.search_and_store_listings(url, storage_client, incremental=True)
+    mongo.get_collection('listings').delete_many({})
+    _, second, _, _ = pipelines.search_and_store_listings(url, storage_client, incremental=True)
+
+    assert second.endswith('.delta.parquet')
+    assert mongo.get_collection('listings').find_one({'file': second})['base'] == first